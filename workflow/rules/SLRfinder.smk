@@ -11,21 +11,36 @@
 
 ###########################################################################
 
+def sweep_dirs():
+    """Directories of the min_LD x min.cl.size combinations of the sweep, named as SLRfinder_scripts.R names them."""
+    sweep = config["SLRfinder"]["sweep"]
+    return [f"LD{ld * 10:g}cl{cl}" for ld in sweep["min_LD"] for cl in sweep["min_cl_size"]]
+
+def sweep_settings():
+    sweep = config["SLRfinder"]["sweep"]
+    return (f"sweep_min_LD={','.join(map(str, sweep['min_LD']))} "
+            f"sweep_cl_size={','.join(map(str, sweep['min_cl_size']))}")
+
 ################################################
 ## Rule: vcf_filtering_ld_estimation
-## Description: This rule filters the VCF files and estimates LD using vcftools.
+## Description: This rule filters the VCF files and estimates LD in a single streaming pass
+## (same filters as bcftools view + vcftools, r² as vcftools --geno-r2 --ld-window).
 ## Look for PASS flag -> the ones that have passed the Marina check. (gatk calling)
+## Indexed input VCFs are processed in parallel genomic chunks.
 ################################################
 
 rule vcf_filtering_ld_estimation:
     input:
         # The VCF files for each chromosome/contig and the reference list
         vcf="data/raw/ShortVariants_HardCallableFiltered.{chromosomes}.vcf.gz", # Adapt path if you want to use the VCF subset
+        # Tabix index of the VCF, needed to split it into parallel chunks
+        tbi="data/raw/ShortVariants_HardCallableFiltered.{chromosomes}.vcf.gz.tbi",
         reference="tmp/amphioxus/reference.list"
     output:
-        # Output filtered VCF and LD edge list
-        filtered_vcf="tmp/amphioxus/a15m75/amphioxus_{chromosomes}_a15m75.recode.vcf",
-        ld_file="tmp/amphioxus/GenoLD.snp100/amphioxus_{chromosomes}_a15m75.geno.ld"
+        # Output filtered VCF (bgzipped + tabix index) and LD edge list (compact Parquet, see common/ld.py)
+        filtered_vcf="tmp/amphioxus/a15m75/amphioxus_{chromosomes}_a15m75.vcf.gz",
+        filtered_tbi="tmp/amphioxus/a15m75/amphioxus_{chromosomes}_a15m75.vcf.gz.tbi",
+        ld_file="tmp/amphioxus/GenoLD.snp100/amphioxus_{chromosomes}_a15m75.ld.parquet"
     log:
         err = "logs/SLRfinder/vcf_filtering_ld_estimation_{chromosomes}.err",
         out = "logs/SLRfinder/vcf_filtering_ld_estimation_{chromosomes}.out"
@@ -37,57 +52,262 @@ rule vcf_filtering_ld_estimation:
         min_q = 30,
         maf = 0.15,
         max_missing = 0.75,
-        ld_window = 100
+        ld_window = 100,
+        # Only LD edges above this r² are written; SLRfinder only uses edges above min_LD
+        min_r2 = config["SLRfinder"]["ld_min_r2"]
+    threads: config["SLRfinder"]["ld_threads"]
     resources:
-        mem_mb = 1000,
+        mem_mb = 4000,
+        cpus_per_task = config["SLRfinder"]["ld_threads"],
+        threads = config["SLRfinder"]["ld_threads"],
+        runtime = "30m"
+    shell:
+        """
+        python workflow/scripts/SLRfinder/vcf_filter_ld.py \
+            --vcf {input.vcf} \
+            --out_vcf {output.filtered_vcf} \
+            --out_ld {output.ld_file} \
+            --min_ac {params.min_ac} \
+            --min_gq {params.min_gq} \
+            --min_q {params.min_q} \
+            --maf {params.maf} \
+            --max_missing {params.max_missing} \
+            --ld_window {params.ld_window} \
+            --min_r2 {params.min_r2} \
+            --threads {threads} \
+            > {log.out} 2> {log.err}
+        """
+
+################################################
+## Rule: SLRfinder_ld_clusters
+## Description: This rule finds the LD clusters of one chromosome and writes its SNP whitelist.
+################################################
+
+rule SLRfinder_ld_clusters:
+    input:
+        "tmp/amphioxus/SLRfinder_scripts.R",
+        "tmp/amphioxus/SLRfinder_functions.r",
+        "tmp/amphioxus/amphioxus.csv",
+        "tmp/amphioxus/reference.list",
+        ld_file="tmp/amphioxus/GenoLD.snp100/amphioxus_{chromosomes}_a15m75.ld.parquet"
+    output:
+        whitelist="tmp/amphioxus/LD8.5cl20/whitelist/position.{chromosomes}.list",
+        clusters="tmp/amphioxus/LD8.5cl20/clusters/amphioxus_{chromosomes}.rds"
+    log:
+        err = "logs/SLRfinder/SLRfinder_ld_clusters_{chromosomes}.err",
+        out = "logs/SLRfinder/SLRfinder_ld_clusters_{chromosomes}.out"
+    conda:
+        '../envs/SLRfinder.yaml'
+    resources:
+        mem_mb = 8000,
         cpus_per_task = 1,
         threads = 1,
-        runtime = "15m"
+        runtime = "2h"
+    shell:
+        """
+        cd tmp/amphioxus
+        Rscript SLRfinder_scripts.R ld_clusters {threads} {wildcards.chromosomes} > ./../../{log.out} 2> ./../../{log.err}
+        """
+
+################################################
+## Rule: SLRfinder_geno012
+## Description: This rule streams the filtered VCFs once, chromosomes in parallel, and writes the 012
+## genotypes of all whitelisted SNPs into one int8 matrix (.012.npy) with its SNP map and sample order.
+################################################
+
+rule SLRfinder_geno012:
+    input:
+        "tmp/amphioxus/SLRfinder_scripts.R",
+        "tmp/amphioxus/SLRfinder_functions.r",
+        "tmp/amphioxus/vcf_to_012.py",
+        vcf=expand("tmp/amphioxus/a15m75/amphioxus_{chromosomes}_a15m75.vcf.gz", chromosomes=config["CHROMOSOMES"]),
+        whitelist=expand("tmp/amphioxus/LD8.5cl20/whitelist/position.{chromosomes}.list", chromosomes=config["CHROMOSOMES"])
+    output:
+        multiext("tmp/amphioxus/LD8.5cl20/file012/amphioxus_a15m75_LD0.85cl20", ".012.npy", ".012.pos", ".012.indv")
+    log:
+        err = "logs/SLRfinder/SLRfinder_geno012.err",
+        out = "logs/SLRfinder/SLRfinder_geno012.out"
+    conda:
+        '../envs/SLRfinder.yaml'
+    threads: config["SLRfinder"]["ncores"]
+    resources:
+        mem_mb = 4000,
+        cpus_per_task = config["SLRfinder"]["ncores"],
+        threads = config["SLRfinder"]["ncores"],
+        runtime = "1h"
     shell:
         """
-        # Create necessary directories inside the 'tmp/amphioxus' folder if they don't exist
-        mkdir -p tmp/amphioxus/a15m75
-        mkdir -p tmp/amphioxus/GenoLD.snp100
+        cd tmp/amphioxus
+        Rscript SLRfinder_scripts.R geno012 {threads} > ./../../{log.out} 2> ./../../{log.err}
+        """
 
-        # Step 1: SNP filtering using bcftools and vcftools
-        bcftools view -m2 -M2 -v snps -i 'FILTER="PASS"' --min-ac={params.min_ac} {input.vcf} \
-        | vcftools --vcf - --minGQ {params.min_gq} --minQ {params.min_q} --maf {params.maf} --max-missing {params.max_missing} \
-        --recode --recode-INFO-all --out tmp/amphioxus/a15m75/amphioxus_{wildcards.chromosomes}_a15m75 \
-        > {log.out} 2> {log.err}
+################################################
+## Rule: SLRfinder_cluster_metrics
+## Description: This rule computes the PCA and heterozygosity metrics of the LD clusters of one chromosome.
+################################################
 
-        # Step 2: LD estimation using vcftools
-        vcftools --vcf tmp/amphioxus/a15m75/amphioxus_{wildcards.chromosomes}_a15m75.recode.vcf --geno-r2 --ld-window {params.ld_window} \
-        --out tmp/amphioxus/GenoLD.snp100/amphioxus_{wildcards.chromosomes}_a15m75 \
-        > {log.out} 2> {log.err}
+rule SLRfinder_cluster_metrics:
+    input:
+        "tmp/amphioxus/SLRfinder_scripts.R",
+        "tmp/amphioxus/SLRfinder_functions.r",
+        clusters="tmp/amphioxus/LD8.5cl20/clusters/amphioxus_{chromosomes}.rds",
+        geno012=multiext("tmp/amphioxus/LD8.5cl20/file012/amphioxus_a15m75_LD0.85cl20", ".012.npy", ".012.pos", ".012.indv")
+    output:
+        "tmp/amphioxus/LD8.5cl20/metrics/amphioxus_{chromosomes}.rds"
+    log:
+        err = "logs/SLRfinder/SLRfinder_cluster_metrics_{chromosomes}.err",
+        out = "logs/SLRfinder/SLRfinder_cluster_metrics_{chromosomes}.out"
+    conda:
+        '../envs/SLRfinder.yaml'
+    threads: config["SLRfinder"]["ncores"]
+    resources:
+        mem_mb = 16000,
+        cpus_per_task = config["SLRfinder"]["ncores"],
+        threads = config["SLRfinder"]["ncores"],
+        runtime = "6h"
+    shell:
+        """
+        cd tmp/amphioxus
+        Rscript SLRfinder_scripts.R metrics {threads} {wildcards.chromosomes} > ./../../{log.out} 2> ./../../{log.err}
         """
 
 ################################################
-## Rule: SLRfinder_main
-## Description: This rule runs the SLRfinder analysis on the filtered VCF files.
+## Rule: SLRfinder_rank_candidates
+## Description: This rule ranks the LD clusters of all chromosomes, runs the rank permutations
+## and reports the SLR candidates. The ranked clusters go to a split results store (store/): a cluster
+## table, the SNPs of every cluster and the per-individual data, each readable one cluster at a time.
 ################################################
 
-rule SLRfinder_main:
+rule SLRfinder_rank_candidates:
     input:
         "tmp/amphioxus/SLRfinder_scripts.R",
         "tmp/amphioxus/SLRfinder_functions.r",
-        expand("tmp/amphioxus/GenoLD.snp100/amphioxus_{chromosomes}_a15m75.geno.ld", chromosomes=config["CHROMOSOMES"]),
-        expand("tmp/amphioxus/a15m75/amphioxus_{chromosomes}_a15m75.recode.vcf", chromosomes=config["CHROMOSOMES"])
+        expand("tmp/amphioxus/LD8.5cl20/metrics/amphioxus_{chromosomes}.rds", chromosomes=config["CHROMOSOMES"])
     output:
-        directory("tmp/amphioxus/LD8.5cl20"),
+        multiext("tmp/amphioxus/LD8.5cl20/store/", "clusters.parquet", "cluster_snps.parquet", "cluster_data.parquet"),
         "tmp/amphioxus/LD8.5cl20/candidates.csv",
         "tmp/amphioxus/LD8.5cl20/sex_filter.csv"
     log:
-        err = "logs/SLRfinder/SLRfinder_main.err",
-        out = "logs/SLRfinder/SLRfinder_main.out"
+        err = "logs/SLRfinder/SLRfinder_rank_candidates.err",
+        out = "logs/SLRfinder/SLRfinder_rank_candidates.out"
     conda:
         '../envs/SLRfinder.yaml'
+    params:
+        nPerm = config["SLRfinder"]["nPerm"],
+        perm_min_exceed = config["SLRfinder"]["perm_min_exceed"]
+    threads: config["SLRfinder"]["ncores"]
     resources:
-        mem_mb = 50000,
+        mem_mb = 16000,
+        cpus_per_task = config["SLRfinder"]["ncores"],
+        threads = config["SLRfinder"]["ncores"],
+        runtime = "6h"
+    shell:
+        """
+        cd tmp/amphioxus
+        Rscript SLRfinder_scripts.R rank {threads} nPerm={params.nPerm} perm_min_exceed={params.perm_min_exceed} \
+        > ./../../{log.out} 2> ./../../{log.err}
+        """
+
+################################################
+## Rule: SLRfinder_merge_tree
+## Description: This rule builds the maximum spanning forest of the LD edges of one chromosome,
+## from which the LD clusters of any min_LD above the LD floor are extracted without reloading LD.
+################################################
+
+rule SLRfinder_merge_tree:
+    input:
+        "tmp/amphioxus/SLRfinder_scripts.R",
+        "tmp/amphioxus/SLRfinder_functions.r",
+        "tmp/amphioxus/amphioxus.csv",
+        "tmp/amphioxus/reference.list",
+        ld_file="tmp/amphioxus/GenoLD.snp100/amphioxus_{chromosomes}_a15m75.ld.parquet"
+    output:
+        "tmp/amphioxus/sweep/merge_tree/amphioxus_{chromosomes}.rds"
+    log:
+        err = "logs/SLRfinder/SLRfinder_merge_tree_{chromosomes}.err",
+        out = "logs/SLRfinder/SLRfinder_merge_tree_{chromosomes}.out"
+    conda:
+        '../envs/SLRfinder.yaml'
+    resources:
+        mem_mb = 8000,
         cpus_per_task = 1,
         threads = 1,
+        runtime = "2h"
+    shell:
+        """
+        cd tmp/amphioxus
+        Rscript SLRfinder_scripts.R merge_tree {threads} {wildcards.chromosomes} > ./../../{log.out} 2> ./../../{log.err}
+        """
+
+################################################
+## Rule: SLRfinder_sweep
+## Description: This rule extracts the LD clusters of one chromosome for every min_LD x min.cl.size
+## combination of config["SLRfinder"]["sweep"] from its merge tree, and computes their metrics from
+## one 012 extraction of the SNPs of the loosest combination.
+################################################
+
+rule SLRfinder_sweep:
+    input:
+        "tmp/amphioxus/SLRfinder_scripts.R",
+        "tmp/amphioxus/SLRfinder_functions.r",
+        "tmp/amphioxus/vcf_to_012.py",
+        vcf="tmp/amphioxus/a15m75/amphioxus_{chromosomes}_a15m75.vcf.gz",
+        merge_tree="tmp/amphioxus/sweep/merge_tree/amphioxus_{chromosomes}.rds"
+    output:
+        clusters=expand("tmp/amphioxus/sweep/{combo}/clusters/amphioxus_{{chromosomes}}.rds", combo=sweep_dirs()),
+        metrics=expand("tmp/amphioxus/sweep/{combo}/metrics/amphioxus_{{chromosomes}}.rds", combo=sweep_dirs())
+    log:
+        err = "logs/SLRfinder/SLRfinder_sweep_{chromosomes}.err",
+        out = "logs/SLRfinder/SLRfinder_sweep_{chromosomes}.out"
+    conda:
+        '../envs/SLRfinder.yaml'
+    params:
+        sweep = sweep_settings()
+    threads: config["SLRfinder"]["ncores"]
+    resources:
+        mem_mb = 16000,
+        cpus_per_task = config["SLRfinder"]["ncores"],
+        threads = config["SLRfinder"]["ncores"],
+        runtime = "12h"
+    shell:
+        """
+        cd tmp/amphioxus
+        Rscript SLRfinder_scripts.R sweep {threads} {wildcards.chromosomes} {params.sweep} > ./../../{log.out} 2> ./../../{log.err}
+        """
+
+################################################
+## Rule: SLRfinder_sweep_rank
+## Description: This rule ranks the LD clusters and reports the SLR candidates of every combination
+## of the sweep (run it with `snakemake SLRfinder_sweep_rank`).
+################################################
+
+rule SLRfinder_sweep_rank:
+    input:
+        "tmp/amphioxus/SLRfinder_scripts.R",
+        "tmp/amphioxus/SLRfinder_functions.r",
+        expand("tmp/amphioxus/sweep/{combo}/metrics/amphioxus_{chromosomes}.rds", combo=sweep_dirs(), chromosomes=config["CHROMOSOMES"])
+    output:
+        expand("tmp/amphioxus/sweep/{combo}/store/{table}.parquet", combo=sweep_dirs(),
+               table=["clusters", "cluster_snps", "cluster_data"]),
+        expand("tmp/amphioxus/sweep/{combo}/candidates.csv", combo=sweep_dirs())
+    log:
+        err = "logs/SLRfinder/SLRfinder_sweep_rank.err",
+        out = "logs/SLRfinder/SLRfinder_sweep_rank.out"
+    conda:
+        '../envs/SLRfinder.yaml'
+    params:
+        sweep = sweep_settings(),
+        nPerm = config["SLRfinder"]["nPerm"],
+        perm_min_exceed = config["SLRfinder"]["perm_min_exceed"]
+    threads: config["SLRfinder"]["ncores"]
+    resources:
+        mem_mb = 16000,
+        cpus_per_task = config["SLRfinder"]["ncores"],
+        threads = config["SLRfinder"]["ncores"],
         runtime = "24h"
     shell:
         """
         cd tmp/amphioxus
-        Rscript SLRfinder_scripts.R > ./../../{log.out} 2> ./../../{log.err}
+        Rscript SLRfinder_scripts.R sweep_rank {threads} {params.sweep} nPerm={params.nPerm} perm_min_exceed={params.perm_min_exceed} \
+        > ./../../{log.out} 2> ./../../{log.err}
         """
@@ -11,6 +11,11 @@
 
 ###########################################################################
 
+def ncbi_local_source(key):
+    """The configured source as an input file when it is a local path, nothing when it is a URL."""
+    source = config["go"][key]
+    return [] if "://" in source else [source]
+
 rule extract_background_gene_list:
     """
     Extract background gene list from GFF annotation file.
@@ -36,7 +41,7 @@ rule extract_gene_list:
     Extract gene names from GFF in a region of interest.
     """
     input:
-        gff = "data/annotation/genomic.gff"
+        gff_store = "data/annotation/genomic.parquet"
     output:
         gene_list = "results/go/genes_in_region.txt"
     log:
@@ -51,7 +56,7 @@ rule extract_gene_list:
     shell:
         """
         python workflow/scripts/go/extract_gene_list.py \
-            --gff {input.gff} \
+            --gff_store {input.gff_store} \
             --seqid {params.seqid} \
             --start {params.start} \
             --end {params.end} \
@@ -60,8 +65,13 @@ rule extract_gene_list:
         """
 
 rule extract_gene_info:
+    """
+    Keep the taxid 7740 rows of NCBI gene_info and the locus_tag -> GeneID map in one
+    streaming pass over the dump (a local file or the NCBI URL, see config["go"]).
+    """
+    input:
+        source = ncbi_local_source("gene_info_source")
     output:
-        raw = "data/go/gene_info.gz",
         filtered = "data/go/gene_info_7740.tsv",
         map = "data/go/locus_tag_to_geneid.tsv"
     log:
@@ -69,46 +79,50 @@ rule extract_gene_info:
         err = "logs/go/extract_gene_info.err"
     conda:
         "../envs/go.yaml"
+    params:
+        source = config["go"]["gene_info_source"]
+    resources:
+        mem_mb = 1000, cpus_per_task = 1, threads = 1, runtime = "1h"
     shell:
         """
-        # Step 1: Download full gene_info file from NCBI
-        wget -N -O {output.raw} ftp://ftp.ncbi.nlm.nih.gov/gene/DATA/gene_info.gz \
+        python workflow/scripts/go/filter_ncbi_taxon.py \
+            --source {params.source} \
+            --taxid 7740 \
+            --output {output.filtered} \
+            --locus_map {output.map} \
             > {log.out} 2> {log.err}
-
-        # Step 2: Filter only rows for amphioxus species (TaxID: 7740) + include header
-        zcat {output.raw} | awk -F'\t' 'NR==1 || $1 == "7740"' > {output.filtered}
-
-        # Step 3: Extract locus_tag and GeneID
-        awk -F '\t' 'BEGIN{{OFS="\t"}} NR>1 && $7 != "-" {{print $7, $2}}' {output.filtered} > {output.map}
         """
 
 
-rule build_locus_to_geneid_map:
+rule build_id_mapping:
+    """
+    Index GFF gene IDs, locus tags and NCBI GeneIDs once (Parquet, sorted by gene ID).
+    """
     input:
-        gff = "data/annotation/genomic.gff",
+        gff_store = "data/annotation/genomic.parquet",
         gene_info = "data/go/gene_info_7740.tsv"
     output:
-        map = "data/annotation/locus_to_geneid_map.tsv"
+        index = "data/annotation/id_mapping.parquet"
     conda:
         "../envs/go.yaml"
     log:
-        out = "logs/go/build_locus_to_geneid_map.out",
-        err = "logs/go/build_locus_to_geneid_map.err"
+        out = "logs/go/build_id_mapping.out",
+        err = "logs/go/build_id_mapping.err"
     resources:
         mem_mb = 2000, cpus_per_task = 1, threads = 1, runtime = "5m"
     shell:
         """
-        python workflow/scripts/go/build_locus_to_geneid_map.py \
-            --gff {input.gff} \
+        python workflow/scripts/go/id_mapping.py build \
+            --gff_store {input.gff_store} \
             --gene_info {input.gene_info} \
-            --output {output.map} \
+            --output {output.index} \
             > {log.out} 2> {log.err}
         """
 
 rule convert_target_genes:
     input:
         genes = "results/go/genes_in_region.txt",
-        map = "data/annotation/locus_to_geneid_map.tsv"
+        index = "data/annotation/id_mapping.parquet"
     output:
         ids = "results/go/target_geneids.txt"
     log:
@@ -117,12 +131,13 @@ rule convert_target_genes:
     conda:
         "../envs/go.yaml"
     resources:
-        mem_mb = 8000, cpus_per_task = 1, threads = 1, runtime = "10m"
+        mem_mb = 2000, cpus_per_task = 1, threads = 1, runtime = "10m"
     shell:
         """
-        python workflow/scripts/go/convert_gene_list_to_ids.py \
-            --gene_list {input.genes} \
-            --mapping {input.map} \
+        python workflow/scripts/go/id_mapping.py convert \
+            --index {input.index} \
+            --input {input.genes} \
+            --to GeneID \
             --output {output.ids} \
             > {log.out} 2> {log.err}
         """
@@ -130,7 +145,7 @@ rule convert_target_genes:
 rule convert_background_genes:
     input:
         genes = "data/annotation/all_genes.txt",
-        map = "data/annotation/locus_to_geneid_map.tsv"
+        index = "data/annotation/id_mapping.parquet"
     output:
         ids = "data/annotation/all_geneids.txt"
     log:
@@ -139,19 +154,26 @@ rule convert_background_genes:
     conda:
         "../envs/go.yaml"
     resources:
-        mem_mb = 8000, cpus_per_task = 1, threads = 1, runtime = "10m"
+        mem_mb = 2000, cpus_per_task = 1, threads = 1, runtime = "10m"
     shell:
         """
-        python workflow/scripts/go/convert_gene_list_to_ids.py \
-            --gene_list {input.genes} \
-            --mapping {input.map} \
+        python workflow/scripts/go/id_mapping.py convert \
+            --index {input.index} \
+            --input {input.genes} \
+            --to GeneID \
             --output {output.ids} \
             > {log.out} 2> {log.err}
         """
 
 rule extract_gene2go:
+    """
+    Keep the taxid 7740 rows of NCBI gene2go in one streaming pass and fetch the GO DAG.
+    Both sources can be local files for offline reruns (see config["go"]).
+    """
+    input:
+        source = ncbi_local_source("gene2go_source"),
+        obo_source = ncbi_local_source("obo_source")
     output:
-        raw = "data/go/gene2go.gz",
         filtered = "data/go/gene2go_7740.tsv",
         obo = "data/go/go-basic.obo"
     log:
@@ -159,19 +181,24 @@ rule extract_gene2go:
         err = "logs/go/extract_gene2go.err"
     conda:
         "../envs/go.yaml"
+    params:
+        source = config["go"]["gene2go_source"],
+        obo_source = config["go"]["obo_source"]
     resources:
-        mem_mb = 4000, cpus_per_task = 1, threads = 1, runtime = "10m"
+        mem_mb = 1000, cpus_per_task = 1, threads = 1, runtime = "1h"
     shell:
         """
-        mkdir -p data/go logs/go
-
-        wget -N -O {output.raw} ftp://ftp.ncbi.nlm.nih.gov/gene/DATA/gene2go.gz \
-            >> {log.out} 2>> {log.err}
-
-        zgrep -E "^GeneID|^7740" {output.raw} > {output.filtered}
+        python workflow/scripts/go/filter_ncbi_taxon.py \
+            --source {params.source} \
+            --taxid 7740 \
+            --output {output.filtered} \
+            > {log.out} 2> {log.err}
 
-        wget -N -O {output.obo} http://purl.obolibrary.org/obo/go/go-basic.obo \
-            >> {log.out} 2>> {log.err}
+        if [ -e "{params.obo_source}" ]; then
+            cp {params.obo_source} {output.obo}
+        else
+            wget -O {output.obo} {params.obo_source} >> {log.out} 2>> {log.err}
+        fi
         """
 
 rule go_enrichment:
@@ -200,5 +227,71 @@ rule go_enrichment:
             --target {input.target_genes} \
             --background {input.background_genes} \
             --out {output.enriched} \
+            --cache_dir data/go/cache \
+            > {log.out} 2> {log.err}
+        """
+
+rule candidate_study_sets:
+    """
+    Gene sets of every SLRfinder candidate region, for each flank size in config["go"]["windows"].
+    """
+    input:
+        candidates = "tmp/amphioxus/LD8.5cl20/candidates.csv",
+        gff_store = "data/annotation/genomic.parquet",
+        id_index = "data/annotation/id_mapping.parquet",
+        chrom_map = "data/annotation/mapping.txt"
+    output:
+        sets = "results/go/candidate_study_sets.tsv"
+    log:
+        out = "logs/go/candidate_study_sets.out",
+        err = "logs/go/candidate_study_sets.err"
+    conda:
+        "../envs/go.yaml"
+    params:
+        windows = config["go"]["windows"]
+    resources:
+        mem_mb = 4000, cpus_per_task = 1, threads = 1, runtime = "10m"
+    shell:
+        """
+        python workflow/scripts/go/candidate_study_sets.py \
+            --candidates {input.candidates} \
+            --gff_store {input.gff_store} \
+            --id_index {input.id_index} \
+            --chrom_map {input.chrom_map} \
+            --windows {params.windows} \
+            --output {output.sets} \
+            > {log.out} 2> {log.err}
+        """
+
+rule go_enrichment_candidates:
+    """
+    Run GO enrichment for all candidate study sets at once, loading the DAG and the
+    associations once (associations cached in data/go/cache) and running the sets in a process pool.
+    """
+    input:
+        gene2go = "data/go/gene2go_7740.tsv",
+        obo = "data/go/go-basic.obo",
+        study_sets = "results/go/candidate_study_sets.tsv",
+        background_genes = "data/annotation/all_geneids.txt"
+    output:
+        enriched = "results/go/go_enrichment_candidates.tsv"
+    log:
+        out = "logs/go/enrichment_candidates.out",
+        err = "logs/go/enrichment_candidates.err"
+    conda:
+        "../envs/go.yaml"
+    threads: config["go"]["threads"]
+    resources:
+        mem_mb = 8000, cpus_per_task = config["go"]["threads"], threads = config["go"]["threads"], runtime = "1h"
+    shell:
+        """
+        python workflow/scripts/go/go_enrichment.py \
+            --gene2go {input.gene2go} \
+            --obo {input.obo} \
+            --study_sets {input.study_sets} \
+            --background {input.background_genes} \
+            --out {output.enriched} \
+            --cache_dir data/go/cache \
+            --threads {threads} \
             > {log.out} 2> {log.err}
         """
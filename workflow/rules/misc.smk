@@ -13,7 +13,7 @@
 
 rule check_haplotype_pattern:
     input:
-        table="tmp/amphioxus/amphioxus_chr4.tab"
+        store=multiext("tmp/amphioxus/gtstore/amphioxus_chr4", ".gt.npy", ".pos.npy", ".ref.npy", ".alt.npy", ".meta.npz")
     output:
         table="results/misc/haplotype_check_{start}_{end}.tsv",
         summary="results/misc/haplotype_check_{start}_{end}_summary.txt"
@@ -22,21 +22,70 @@ rule check_haplotype_pattern:
     conda:
         "../envs/misc.yaml"
     params:
+        store="tmp/amphioxus/gtstore/amphioxus_chr4",
         start=lambda wildcards: config["region"]["start"],
         end=lambda wildcards: config["region"]["end"]
     shell:
         """
         python workflow/scripts/misc/check_haplotype_pattern.py \
-            --input {input.table} \
+            --store {params.store} \
             --start {params.start} \
             --end {params.end} \
             --output-prefix results/misc/haplotype_check_{params.start}_{params.end} \
             2> {log.err}
         """
 
+rule extract_ld_cluster_snps:
+    """
+    SNP positions of the focus LD cluster (config["clusters"]["focus"]), from the results store.
+    """
+    input:
+        store="tmp/amphioxus/LD8.5cl20/store/cluster_snps.parquet"
+    output:
+        pos_list="results/misc/ld_cluster_snps.txt"
+    log:
+        err="logs/misc/extract_ld_cluster_snps.err"
+    conda:
+        "../envs/misc.yaml"
+    params:
+        store="tmp/amphioxus/LD8.5cl20/store",
+        cluster=config["clusters"]["focus"]
+    shell:
+        """
+        Rscript workflow/scripts/misc/extract_ld_cluster_snps.R \
+            --store {params.store} \
+            --clusters {params.cluster} \
+            --output {output.pos_list} \
+            2> {log.err}
+        """
+
+rule extract_ld_cluster_snps_batch:
+    """
+    SNP positions of every selected LD cluster (config["clusters"]), from one load of the results store.
+    """
+    input:
+        store="tmp/amphioxus/LD8.5cl20/store/cluster_snps.parquet"
+    output:
+        directory("results/misc/ld_cluster_snps")
+    log:
+        err="logs/misc/extract_ld_cluster_snps_batch.err"
+    conda:
+        "../envs/misc.yaml"
+    params:
+        store="tmp/amphioxus/LD8.5cl20/store",
+        selection=cluster_selection()
+    shell:
+        """
+        Rscript workflow/scripts/misc/extract_ld_cluster_snps.R \
+            --store {params.store} \
+            {params.selection} \
+            --out_dir {output} \
+            2> {log.err}
+        """
+
 rule check_haplotype_pattern_combined:
     input:
-        table="tmp/amphioxus/amphioxus_chr4.tab",
+        store=multiext("tmp/amphioxus/gtstore/amphioxus_chr4", ".gt.npy", ".pos.npy", ".ref.npy", ".alt.npy", ".meta.npz"),
         pos_list="results/misc/ld_cluster_snps.txt"
     output:
         table="results/misc/haplotype_check_combined.tsv",
@@ -46,12 +95,13 @@ rule check_haplotype_pattern_combined:
     conda:
         "../envs/misc.yaml"
     params:
+        store="tmp/amphioxus/gtstore/amphioxus_chr4",
         start=lambda wildcards: config["region"]["start"],
         end=lambda wildcards: config["region"]["end"]
     shell:
         """
         python workflow/scripts/misc/check_haplotype_pattern.py \
-            --input {input.table} \
+            --store {params.store} \
             --start {params.start} \
             --end {params.end} \
             --pos-list {input.pos_list} \
@@ -85,7 +135,7 @@ rule normalize_ld_clusters:
 # vcf="data/raw/ShortVariants_HardCallableFiltered.{chromosome}.vcf.gz"
 rule count_raw_snps:
     input:
-        vcf="tmp/amphioxus/a15m75/amphioxus_{chromosome}_a15m75.recode.vcf"
+        vcf="tmp/amphioxus/a15m75/amphioxus_{chromosome}_a15m75.vcf.gz"
     output:
         snp_count="results/misc/snp_counts/ShortVariants_HardCallableFiltered.{chromosome}.txt"
     log:
@@ -60,7 +60,7 @@ rule gene_region_plot:
     Plot genes in a specified genomic region from a GFF3 file.
     """
     input:
-        gff = "data/annotation/genomic.gff"
+        gff_store = "data/annotation/genomic.parquet"
     output:
         png = "results/plots/gene_region.png",
         pdf = "results/plots/gene_region.pdf",
@@ -82,7 +82,7 @@ rule gene_region_plot:
     shell:
         """
         python workflow/scripts/plots/gene_region_plot.py \
-            --gff {input.gff} \
+            --gff_store {input.gff_store} \
             --seqid {params.seqid} \
             --start {params.start} \
             --end {params.end} \
@@ -102,7 +102,8 @@ rule vcf_to_tab:
     Convert VCF to tabular format using GATK VariantsToTable for each chromosome.
     """
     input:
-        vcf = "tmp/amphioxus/a15m75/amphioxus_{chrom}_a15m75.recode.vcf"
+        vcf = "tmp/amphioxus/a15m75/amphioxus_{chrom}_a15m75.vcf.gz",
+        tbi = "tmp/amphioxus/a15m75/amphioxus_{chrom}_a15m75.vcf.gz.tbi"
     output:
         tab = "tmp/amphioxus/amphioxus_{chrom}.tab"
     log:
@@ -125,6 +126,40 @@ rule vcf_to_tab:
             > {log.out} 2> {log.err}
         """
 
+################################################
+## Rule: tab_to_genotype_store
+## Description: Convert each VariantsToTable file into a memory-mappable int8 genotype store.
+################################################
+
+rule tab_to_genotype_store:
+    """
+    Parse the genotype table once into an int8 dosage matrix (samples x SNPs), int32 positions
+    and REF/ALT/sample/sex metadata, so downstream plots do not re-parse genotype strings.
+    """
+    input:
+        tab = "tmp/amphioxus/amphioxus_{chrom}.tab"
+    output:
+        store = multiext("tmp/amphioxus/gtstore/amphioxus_{chrom}", ".gt.npy", ".pos.npy", ".ref.npy", ".alt.npy", ".meta.npz")
+    params:
+        prefix = "tmp/amphioxus/gtstore/amphioxus_{chrom}"
+    log:
+        out = "logs/plots/tab_to_genotype_store_{chrom}.out",
+        err = "logs/plots/tab_to_genotype_store_{chrom}.err"
+    conda:
+        "../envs/plots.yaml"
+    resources:
+        mem_mb = 8000,
+        cpus_per_task = 1,
+        threads = 1,
+        runtime = "20m"
+    shell:
+        """
+        python workflow/scripts/plots/tab_to_genotype_store.py \
+            --input {input.tab} \
+            --output_prefix {params.prefix} \
+            > {log.out} 2> {log.err}
+        """
+
 rule concat_tabs:
     input:
         tabs = expand("tmp/amphioxus/amphioxus_{chrom}.tab", chrom=config["CHROMOSOMES"])
@@ -150,7 +185,7 @@ rule heterozygosity_plot:
     Plot smoothed heterozygosity by sex from a VCF tab file.
     """
     input:
-        tab = "tmp/amphioxus/amphioxus_chr4.tab"
+        store = multiext("tmp/amphioxus/gtstore/amphioxus_chr4", ".gt.npy", ".pos.npy", ".ref.npy", ".alt.npy", ".meta.npz")
     output:
         png = "results/plots/heterozygosity_plot.png",
         pdf = "results/plots/heterozygosity_plot.pdf",
@@ -161,17 +196,21 @@ rule heterozygosity_plot:
     conda:
         "../envs/plots.yaml"
     params:
+        store = "tmp/amphioxus/gtstore/amphioxus_chr4",
         region_start = 6142346,
-        region_end = 6177987
+        region_end = 6177987,
+        # Only the plotted window is read from the genotype store
+        region = f"chr4:{6142346 - 5000}-{6177987 + 50000}"
     shell:
         """
         python workflow/scripts/plots/heterozygosity_plot.py \
-            --input {input.tab} \
+            --store {params.store} \
             --out_png {output.png} \
             --out_pdf {output.pdf} \
             --out_svg {output.svg} \
             --region_start {params.region_start} \
             --region_end {params.region_end} \
+            --region {params.region} \
             > {log.out} 2> {log.err}
         """
 
@@ -185,7 +224,7 @@ rule heterozygosity_raw_plot:
     Plot raw (non-smoothed) heterozygosity by sex using scatter points.
     """
     input:
-        tab = "tmp/amphioxus/amphioxus_chr4.tab"
+        store = multiext("tmp/amphioxus/gtstore/amphioxus_chr4", ".gt.npy", ".pos.npy", ".ref.npy", ".alt.npy", ".meta.npz")
     output:
         png = "results/plots/heterozygosity_raw.png",
         pdf = "results/plots/heterozygosity_raw.pdf",
@@ -196,17 +235,21 @@ rule heterozygosity_raw_plot:
     conda:
         "../envs/plots.yaml"
     params:
+        store = "tmp/amphioxus/gtstore/amphioxus_chr4",
         region_start = 6142346,
-        region_end = 6177987
+        region_end = 6177987,
+        # Only the plotted window is read from the genotype store
+        region = f"chr4:{6142346 - 5000}-{6177987 + 5000}"
     shell:
         """
         python workflow/scripts/plots/heterozygosity_raw_plot.py \
-            --input {input.tab} \
+            --store {params.store} \
             --out_png {output.png} \
             --out_pdf {output.pdf} \
             --out_svg {output.svg} \
             --region_start {params.region_start} \
             --region_end {params.region_end} \
+            --region {params.region} \
             > {log.out} 2> {log.err}
         """
 
@@ -220,8 +263,8 @@ rule combined_heterozygosity_gene_plot:
     Combine smoothed heterozygosity plot with gene annotation track into one figure.
     """
     input:
-        vcf_tab = "tmp/amphioxus/amphioxus_chr4.tab",
-        gff = "data/annotation/genomic.gff",
+        store = multiext("tmp/amphioxus/gtstore/amphioxus_chr4", ".gt.npy", ".pos.npy", ".ref.npy", ".alt.npy", ".meta.npz"),
+        gff_store = "data/annotation/genomic.parquet",
         top_snps = "results/snp/top5_snps_filtered.tsv"
     output:
         png = "results/plots/combined_view.png",
@@ -233,18 +276,22 @@ rule combined_heterozygosity_gene_plot:
     conda:
         "../envs/plots.yaml"
     params:
+        store = "tmp/amphioxus/gtstore/amphioxus_chr4",
         seqid = "OV696689.1",
         region_start = 6142346,
-        region_end = 6177987
+        region_end = 6177987,
+        # Only the plotted window is read from the genotype store
+        region = f"chr4:{6142346 - 5000}-{6177987 + 25000}"
     shell:
         """
         python workflow/scripts/plots/combined_heterozygosity_gene_plot.py \
-            --vcf_tab {input.vcf_tab} \
-            --gff {input.gff} \
+            --store {params.store} \
+            --gff_store {input.gff_store} \
             --top_snps {input.top_snps} \
             --seqid {params.seqid} \
             --region_start {params.region_start} \
             --region_end {params.region_end} \
+            --region {params.region} \
             --out_png {output.png} \
             --out_pdf {output.pdf} \
             --out_svg {output.svg} \
@@ -313,7 +360,7 @@ rule manhattan_snp_plot:
     Plot a Manhattan plot of sex-specific SNP association using genotype table.
     """
     input:
-        tab = "tmp/amphioxus/amphioxus_all.tab"
+        stores = expand("tmp/amphioxus/gtstore/amphioxus_{chrom}.{ext}", chrom=config["CHROMOSOMES"], ext=["gt.npy", "pos.npy", "ref.npy", "alt.npy", "meta.npz"])
     output:
         png = "results/plots/manhattan_snp.png",
         pdf = "results/plots/manhattan_snp.pdf",
@@ -322,6 +369,8 @@ rule manhattan_snp_plot:
     log:
         out = "logs/plots/manhattan_snp.out",
         err = "logs/plots/manhattan_snp.err"
+    params:
+        stores = expand("tmp/amphioxus/gtstore/amphioxus_{chrom}", chrom=config["CHROMOSOMES"])
     conda:
         "../envs/plots.yaml"
     resources:
@@ -332,7 +381,7 @@ rule manhattan_snp_plot:
     shell:
         """
         python workflow/scripts/plots/manhattan_snp_plot.py \
-            --input {input.tab} \
+            --stores {params.stores} \
             --out_png {output.png} \
             --out_pdf {output.pdf} \
             --out_svg {output.svg} \
@@ -346,8 +395,8 @@ rule figure_2:
     Combine smoothed heterozygosity plot with gene annotation track into one figure.
     """
     input:
-        vcf_tab = "tmp/amphioxus/amphioxus_chr4.tab",
-        gff = "data/annotation/genomic.gff"
+        store = multiext("tmp/amphioxus/gtstore/amphioxus_chr4", ".gt.npy", ".pos.npy", ".ref.npy", ".alt.npy", ".meta.npz"),
+        gff_store = "data/annotation/genomic.parquet"
     output:
         png = "results/plots/figure_2.png",
         pdf = "results/plots/figure_2.pdf",
@@ -358,17 +407,21 @@ rule figure_2:
     conda:
         "../envs/plots.yaml"
     params:
+        store = "tmp/amphioxus/gtstore/amphioxus_chr4",
         seqid = "OV696689.1",
         region_start = 6142346,
-        region_end = 6177987
+        region_end = 6177987,
+        # Only the plotted window is read from the genotype store
+        region = f"chr4:{6142346 - 5000}-{6177987 + 50000}"
     shell:
         """
         python workflow/scripts/plots/figure_2.py \
-            --vcf_tab {input.vcf_tab} \
-            --gff {input.gff} \
+            --store {params.store} \
+            --gff_store {input.gff_store} \
             --seqid {params.seqid} \
             --region_start {params.region_start} \
             --region_end {params.region_end} \
+            --region {params.region} \
             --out_png {output.png} \
             --out_pdf {output.pdf} \
             --out_svg {output.svg} \
@@ -477,7 +530,7 @@ rule heatmap_plot_dual:
 
 rule het_pc1_plot:
     input:
-        rds = "tmp/amphioxus/LD8.5cl20/data_all.rds"
+        store = "tmp/amphioxus/LD8.5cl20/store/cluster_data.parquet"
     output:
         png = "results/plots/het_pc1_plot.png",
         pdf = "results/plots/het_pc1_plot.pdf",
@@ -487,6 +540,9 @@ rule het_pc1_plot:
         err = "logs/plots/het_pc1_plot.err"
     conda:
         "../envs/plots.yaml"
+    params:
+        store = "tmp/amphioxus/LD8.5cl20/store",
+        cluster = config["clusters"]["focus"]
     resources:
         mem_mb = 2000,
         cpus_per_task = 1,
@@ -495,13 +551,46 @@ rule het_pc1_plot:
     shell:
         """
         Rscript workflow/scripts/plots/het_pc1_plot.R \
-            --input {input.rds} \
+            --input {params.store} \
+            --clusters {params.cluster} \
             --out_png {output.png} \
             --out_pdf {output.pdf} \
             --out_svg {output.svg} \
             > {log.out} 2> {log.err}
         """
 
+rule het_pc1_plots_batch:
+    """
+    Het x PC1 plots of every selected LD cluster (config["clusters"]), from one load of the results store.
+    """
+    input:
+        store = "tmp/amphioxus/LD8.5cl20/store/cluster_data.parquet"
+    output:
+        directory("results/plots/het_pc1")
+    log:
+        out = "logs/plots/het_pc1_plots_batch.out",
+        err = "logs/plots/het_pc1_plots_batch.err"
+    conda:
+        "../envs/plots.yaml"
+    params:
+        store = "tmp/amphioxus/LD8.5cl20/store",
+        selection = cluster_selection()
+    threads: config["clusters"]["cores"]
+    resources:
+        mem_mb = 4000,
+        cpus_per_task = config["clusters"]["cores"],
+        threads = config["clusters"]["cores"],
+        runtime = "30m"
+    shell:
+        """
+        Rscript workflow/scripts/plots/het_pc1_plot.R \
+            --input {params.store} \
+            {params.selection} \
+            --out_dir {output} \
+            --cores {threads} \
+            > {log.out} 2> {log.err}
+        """
+
 rule plot_normalized_ld_clusters:
     input:
         table="results/misc/normalized_ld_clusters.tsv",
@@ -72,6 +72,31 @@ rule subset_vcf:
         bcftools index {output.vcf} > {log.out} 2> {log.err}
         """
 
+################################################
+## Rule: index_raw_vcf
+## Description: This rule writes the tabix index of a raw VCF, needed to filter and estimate LD in parallel genomic chunks.
+################################################
+
+rule index_raw_vcf:
+    input:
+        vcf = "data/raw/ShortVariants_HardCallableFiltered.{chromosomes}.vcf.gz"
+    output:
+        tbi = "data/raw/ShortVariants_HardCallableFiltered.{chromosomes}.vcf.gz.tbi"
+    log:
+        err = "logs/setup/index_raw_vcf_{chromosomes}.err",
+        out = "logs/setup/index_raw_vcf_{chromosomes}.out"
+    conda:
+        "../envs/setup.yaml"
+    resources:
+        mem_mb = 2000,
+        cpus_per_task = 1,
+        threads = 1,
+        runtime = "10m"
+    shell:
+        """
+        tabix -f -p vcf {input.vcf} > {log.out} 2> {log.err}
+        """
+
 ################################################
 ## Rule: copy_metadata_and_reference
 ## Description: This rule copies the metadata and reference list to the SLRfinder folder.
@@ -102,16 +127,18 @@ rule copy_metadata_and_reference:
 
 ################################################
 ## Rule: copy_slrfinder_scripts
-## Description: This rule copies the SLRfinder functions to the tmp folder.
+## Description: This rule copies the SLRfinder functions and the 012 extraction script to the tmp folder.
 ################################################
 
 rule copy_slrfinder_scripts:
     input:
         functions = "workflow/scripts/SLRfinder/SLRfinder_functions.r",
-        scripts = "workflow/scripts/SLRfinder/SLRfinder_scripts.R"
+        scripts = "workflow/scripts/SLRfinder/SLRfinder_scripts.R",
+        geno012 = "workflow/scripts/SLRfinder/vcf_to_012.py"
     output:
         functions_out = "tmp/amphioxus/SLRfinder_functions.r",
-        scripts_out = "tmp/amphioxus/SLRfinder_scripts.R"
+        scripts_out = "tmp/amphioxus/SLRfinder_scripts.R",
+        geno012_out = "tmp/amphioxus/vcf_to_012.py"
     log:
         err = "logs/setup/copy_slrfinder_scripts.err",
         out = "logs/setup/copy_slrfinder_scripts.out"
@@ -123,5 +150,34 @@ rule copy_slrfinder_scripts:
     shell:
         """
         cp {input.functions} {output.functions_out} && \
-        cp {input.scripts} {output.scripts_out} > {log.out} 2> {log.err}
-        """
\ No newline at end of file
+        cp {input.scripts} {output.scripts_out} && \
+        cp {input.geno012} {output.geno012_out} > {log.out} 2> {log.err}
+        """
+################################################
+## Rule: gff_to_store
+## Description: This rule parses the genome annotation once into an indexed Parquet store
+## that the region, GO and SNP scripts query instead of re-reading the GFF.
+################################################
+
+rule gff_to_store:
+    input:
+        gff = "data/annotation/genomic.gff"
+    output:
+        store = "data/annotation/genomic.parquet"
+    log:
+        err = "logs/setup/gff_to_store.err",
+        out = "logs/setup/gff_to_store.out"
+    conda:
+        "../envs/setup.yaml"
+    resources:
+        mem_mb = 8000,
+        cpus_per_task = 1,
+        threads = 1,
+        runtime = "15m"
+    shell:
+        """
+        python workflow/scripts/setup/gff_to_store.py \
+            --gff {input.gff} \
+            --output {output.store} \
+            > {log.out} 2> {log.err}
+        """
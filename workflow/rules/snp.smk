@@ -36,7 +36,7 @@ rule annotate_snps:
 
 rule extract_minimal_gff:
     input:
-        gff="data/annotation/genomic.gff"
+        gff_store="data/annotation/genomic.parquet"
     output:
         mini_gff="data/annotation/FLT1_HAO1_subset.gff"
     params:
@@ -46,21 +46,32 @@ rule extract_minimal_gff:
     shell:
         """
         python workflow/scripts/snp/extract_locus_gff.py \
-            --input {input.gff} \
+            --gff_store {input.gff_store} \
             --output {output.mini_gff} \
             --loci {params.loci}
         """
 
 rule fix_gff_for_snpeff:
+    """
+    Link CDS/exons to their mRNA so SnpEff accepts the GFF (the two-locus subset or the genome).
+    """
     input:
-        "data/annotation/FLT1_HAO1_subset.gff"
+        "data/annotation/{gff}.gff"
     output:
-        "data/annotation/FLT1_HAO1_subset.snpeff.gff"
+        "data/annotation/{gff}.snpeff.gff"
+    wildcard_constraints:
+        gff = "FLT1_HAO1_subset|genomic"
     conda:
         "../envs/snp.yaml"
+    threads: 4
+    resources:
+        mem_mb = 2000,
+        cpus_per_task = 4,
+        threads = 4,
+        runtime = "15m"
     shell:
         """
-        python workflow/scripts/snp/fix_gff_for_snpeff.py --input {input} --output {output}
+        python workflow/scripts/snp/fix_gff_for_snpeff.py --input {input} --output {output} --threads {threads}
         """
 
 
@@ -68,38 +79,47 @@ rule build_snpeff_db:
     """
     Creates a custom SnpEff DB for Branchiostoma using files in data/annotation/.
     This rule ensures that the required snpEff.config is created and properly configured.
+    {db} is FLT1_HAO1_subset (the two target loci) or genomic (the whole annotation).
     """
     input:
         fasta = "data/annotation/GCA_927797965.1_BraLan3_genomic.fna",
-        gff = "data/annotation/FLT1_HAO1_subset.snpeff.gff" # Use mini or full gff
+        gff = "data/annotation/{db}.snpeff.gff"
     output:
-        db_built_flag = "data/annotation/snpeff/BranchiostomaLanceolatum/build.done"
+        db_built_flag = "data/annotation/snpeff/{db}/BranchiostomaLanceolatum/build.done"
+    wildcard_constraints:
+        db = "FLT1_HAO1_subset|genomic"
     log:
-        "logs/snp/build_snpeff.err"
+        "logs/snp/build_snpeff_{db}.err"
     conda:
         "../envs/snp.yaml"
+    params:
+        jvm_mem = config["snpeff"]["jvm_mem_gb"]
+    resources:
+        mem_mb = config["snpeff"]["jvm_mem_gb"] * 1024 + 1000,
+        snpeff_jvm = 1
     shell:
         r"""
         set -euo pipefail
+        DB_DIR=data/annotation/snpeff/{wildcards.db}
 
         echo "Creating SnpEff database folder..."
-        mkdir -p data/annotation/snpeff/BranchiostomaLanceolatum
+        mkdir -p $DB_DIR/BranchiostomaLanceolatum
 
         echo "Linking genome FASTA..."
-        ln -sf $(realpath {input.fasta}) data/annotation/snpeff/BranchiostomaLanceolatum/sequences.fa
+        ln -sf $(realpath {input.fasta}) $DB_DIR/BranchiostomaLanceolatum/sequences.fa
 
         echo "Linking GFF..."
-        ln -sf $(realpath {input.gff}) data/annotation/snpeff/BranchiostomaLanceolatum/genes.gff
+        ln -sf $(realpath {input.gff}) $DB_DIR/BranchiostomaLanceolatum/genes.gff
 
         echo "Writing snpEff.config..."
-        DATA_DIR=$(realpath data/annotation/snpeff)
-        cat > data/annotation/snpeff/snpEff.config << EOF
+        DATA_DIR=$(realpath $DB_DIR)
+        cat > $DB_DIR/snpEff.config << EOF
 data.dir = ${{DATA_DIR}}
 BranchiostomaLanceolatum.genome : BranchiostomaLanceolatum
 EOF
 
         echo "Building SnpEff database..."
-        snpEff build -gff3 -noCheckCds -noCheckProtein -c data/annotation/snpeff/snpEff.config BranchiostomaLanceolatum
+        snpEff -Xmx{params.jvm_mem}g build -gff3 -noCheckCds -noCheckProtein -c $DB_DIR/snpEff.config BranchiostomaLanceolatum 2>> {log}
 
         echo "Done building SnpEff DB."
         touch {output.db_built_flag}
@@ -110,17 +130,22 @@ rule annotate_snps_with_snpeff:
     Annotate chr4 variants using the custom SnpEff DB.
     """
     input:
-        vcf = "tmp/amphioxus/a15m75/amphioxus_chr4_a15m75.recode.vcf",
-        db_flag = rules.build_snpeff_db.output.db_built_flag
+        vcf = "tmp/amphioxus/a15m75/amphioxus_chr4_a15m75.vcf.gz",
+        db_flag = "data/annotation/snpeff/FLT1_HAO1_subset/BranchiostomaLanceolatum/build.done"
     output:
         vcf = "results/snp/chr4_snps.ann.vcf"
     log:
         "logs/snp/annotate_snps.err"
     conda:
         "../envs/snp.yaml"
+    params:
+        jvm_mem = config["snpeff"]["jvm_mem_gb"]
+    resources:
+        mem_mb = config["snpeff"]["jvm_mem_gb"] * 1024 + 1000,
+        snpeff_jvm = 1
     shell:
         """
-        snpEff -c data/annotation/snpeff/snpEff.config \
+        snpEff -Xmx{params.jvm_mem}g -c data/annotation/snpeff/FLT1_HAO1_subset/snpEff.config \
             -v BranchiostomaLanceolatum \
             {input.vcf} > {output.vcf} 2>> {log}
         """
@@ -134,22 +159,110 @@ rule summarize_chr4_slrs:
         "../envs/snp.yaml"
     shell:
         """
-        python workflow/scripts/snp/parse_snpeff_chr4.py --input {input.vcf} --output {output.summary}
+        python workflow/scripts/snp/parse_snpeff.py --input {input.vcf} --output {output.summary}
+        """
+
+rule snpeff_shard:
+    """
+    Annotate one shard of a filtered chromosome VCF with the genome-wide SnpEff DB.
+    Each chromosome is split into config["snpeff"]["chunks"] equal spans; shards
+    run concurrently, one JVM each (cap them with --resources snpeff_jvm=N).
+    """
+    input:
+        vcf = "tmp/amphioxus/a15m75/amphioxus_{chromosomes}_a15m75.vcf.gz",
+        tbi = "tmp/amphioxus/a15m75/amphioxus_{chromosomes}_a15m75.vcf.gz.tbi",
+        mapping = "data/annotation/mapping.txt",
+        db_flag = "data/annotation/snpeff/genomic/BranchiostomaLanceolatum/build.done"
+    output:
+        vcf = temp("tmp/snpeff/{chromosomes}/chunk_{chunk}.ann.vcf.gz")
+    log:
+        err = "logs/snp/snpeff_shard_{chromosomes}_{chunk}.err",
+        out = "logs/snp/snpeff_shard_{chromosomes}_{chunk}.out"
+    conda:
+        "../envs/snp.yaml"
+    params:
+        chunks = config["snpeff"]["chunks"],
+        jvm_mem = config["snpeff"]["jvm_mem_gb"]
+    resources:
+        mem_mb = config["snpeff"]["jvm_mem_gb"] * 1024 + 1000,
+        cpus_per_task = 1,
+        threads = 1,
+        runtime = "2h",
+        snpeff_jvm = 1
+    shell:
+        r"""
+        set -euo pipefail
+        REGION=""
+        if [ {params.chunks} -gt 1 ]; then
+            # Span {wildcards.chunk} of {params.chunks} of the chromosome, from the index stats
+            STATS=$(bcftools index -s {input.vcf} | head -n 1)
+            if [ -n "$STATS" ]; then
+                REGION=$(echo "$STATS" | awk -v k={wildcards.chunk} -v n={params.chunks} \
+                    '$2 == "." {{ print "No contig length in the VCF header" > "/dev/stderr"; exit 1 }}
+                     {{ s = int(k * $2 / n) + 1; e = int((k + 1) * $2 / n); print "-r " $1 ":" s "-" e }}')
+            fi
+        fi
+
+        # -noStats: concurrent shards would all write snpEff_summary.html in the working directory
+        bcftools view $REGION -Ou {input.vcf} 2> {log.err} \
+            | bcftools annotate --rename-chrs {input.mapping} -Ov 2>> {log.err} \
+            | snpEff -Xmx{params.jvm_mem}g -noStats \
+                -c data/annotation/snpeff/genomic/snpEff.config \
+                BranchiostomaLanceolatum 2>> {log.err} \
+            | bgzip > {output.vcf}
+        echo "Annotated shard {wildcards.chromosomes}:{wildcards.chunk} $REGION" > {log.out}
+        """
+
+rule snpeff_genome_summary:
+    """
+    Merge the SnpEff shards of all chromosomes into one summary of the annotations
+    in the SLRfinder candidate regions, with counts per gene, impact and effect.
+    """
+    input:
+        shards = expand("tmp/snpeff/{chromosomes}/chunk_{chunk}.ann.vcf.gz",
+                        chromosomes=config["CHROMOSOMES"], chunk=range(config["snpeff"]["chunks"])),
+        candidates = "tmp/amphioxus/LD8.5cl20/candidates.csv",
+        mapping = "data/annotation/mapping.txt"
+    output:
+        summary = "results/snp/genome_candidates_snpeff_summary.tsv",
+        counts = "results/snp/genome_candidates_snpeff_counts.tsv"
+    log:
+        err = "logs/snp/snpeff_genome_summary.err",
+        out = "logs/snp/snpeff_genome_summary.out"
+    conda:
+        "../envs/snp.yaml"
+    resources:
+        mem_mb = 4000,
+        cpus_per_task = 1,
+        threads = 1,
+        runtime = "30m"
+    shell:
+        """
+        python workflow/scripts/snp/parse_snpeff.py \
+            --input {input.shards} \
+            --candidates {input.candidates} \
+            --chrom_map {input.mapping} \
+            --output {output.summary} \
+            --counts {output.counts} \
+            > {log.out} 2> {log.err}
         """
 
+
 rule filter_top_snps:
     input:
         json="results/plots/top5_snps.json",
-        snps="tmp/amphioxus/amphioxus_chr4.tab"
+        store=multiext("tmp/amphioxus/gtstore/amphioxus_chr4", ".gt.npy", ".pos.npy", ".ref.npy", ".alt.npy", ".meta.npz")
     output:
         top_snps="results/snp/top5_snps_filtered.tsv"
+    params:
+        store="tmp/amphioxus/gtstore/amphioxus_chr4"
     conda:
         "../envs/snp.yaml"
     shell:
         """
         python workflow/scripts/snp/filter_top_snps.py \
             --json {input.json} \
-            --snps {input.snps} \
+            --store {params.store} \
             --output {output.top_snps}
         """
 
@@ -157,7 +270,9 @@ rule classify_snps:
     input:
         snps="results/snp/top5_snps_filtered.tsv",
         ref="data/annotation/GCA_927797965.1_BraLan3_genomic.fna",
-        gff="data/annotation/genomic.gff"
+        fai="data/annotation/GCA_927797965.1_BraLan3_genomic.fna.fai",
+        gff_store="data/annotation/genomic.parquet",
+        mapping="data/annotation/mapping.txt"
     output:
         effects="results/snp/top5_snp_effects.tsv"
     conda:
@@ -167,13 +282,51 @@ rule classify_snps:
         python workflow/scripts/snp/classify_snps.py \
             --snps {input.snps} \
             --ref {input.ref} \
-            --gff {input.gff} \
+            --fai {input.fai} \
+            --chrom_map {input.mapping} \
+            --gff_store {input.gff_store} \
             --output {output.effects}
         """
 
+rule classify_chrom_snps:
+    """
+    Classify the effect of every filtered SNP of a chromosome.
+    """
+    input:
+        store=multiext("tmp/amphioxus/gtstore/amphioxus_{chrom}", ".gt.npy", ".pos.npy", ".ref.npy", ".alt.npy", ".meta.npz"),
+        ref="data/annotation/GCA_927797965.1_BraLan3_genomic.fna",
+        fai="data/annotation/GCA_927797965.1_BraLan3_genomic.fna.fai",
+        gff_store="data/annotation/genomic.parquet",
+        mapping="data/annotation/mapping.txt"
+    output:
+        effects="results/snp/{chrom}_snp_effects.tsv"
+    params:
+        store="tmp/amphioxus/gtstore/amphioxus_{chrom}"
+    log:
+        err = "logs/snp/classify_chrom_snps_{chrom}.err",
+        out = "logs/snp/classify_chrom_snps_{chrom}.out"
+    conda:
+        "../envs/snp.yaml"
+    resources:
+        mem_mb = 8000,
+        cpus_per_task = 1,
+        threads = 1,
+        runtime = "15m"
+    shell:
+        """
+        python workflow/scripts/snp/classify_snps.py \
+            --store {params.store} \
+            --ref {input.ref} \
+            --fai {input.fai} \
+            --chrom_map {input.mapping} \
+            --gff_store {input.gff_store} \
+            --output {output.effects} \
+            > {log.out} 2> {log.err}
+        """
+
 rule rename_chroms_vcf:
     input:
-        vcf="tmp/amphioxus/a15m75/amphioxus_chr4_a15m75.recode.vcf",
+        vcf="tmp/amphioxus/a15m75/amphioxus_chr4_a15m75.vcf.gz",
         mapping="data/annotation/mapping.txt"
     output:
         vcf="data/renamed/renamed.vcf.gz"
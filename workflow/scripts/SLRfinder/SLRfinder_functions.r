@@ -6,9 +6,110 @@ library(cowplot)
 library(ggplot2)
 library(ggpubr)
 library(data.table)
-library(SNPRelate)
 
 
+## read an LD edge list with the geno.ld columns (CHR, from, to, N_INDV, r2)
+## .parquet files come from vcf_filter_ld.py: uint32 positions, r2 quantized to uint16 (r2_q/65535),
+## chromosome and r2 floor of the written edges in the file metadata; only edges with r2 > min_LD are loaded
+read_ld_edges <- function(ld_file, min_LD = NULL){
+  if(!grepl("\\.parquet$", ld_file)){
+    edges <- fread(ld_file, header = TRUE, col.names = c("CHR", "from", "to", "N_INDV", "r2"))
+    if(!is.null(min_LD)) edges <- edges[r2 > min_LD]
+    return(edges)
+  }
+  r2_scale <- 65535
+  tbl <- arrow::read_parquet(ld_file, as_data_frame = FALSE)
+  chrom <- tbl$metadata$chrom
+  edges <- as.data.table(as.data.frame(tbl))
+  if(!is.null(min_LD)) edges <- edges[r2_q > floor(min_LD * r2_scale)]
+  #positions as integers, so SNP names do not turn into scientific notation
+  out <- data.table(CHR = rep(if(is.null(chrom)) NA_character_ else chrom, nrow(edges)),
+                    from = as.integer(edges$pos1), to = as.integer(edges$pos2),
+                    N_INDV = edges$n_indv, r2 = edges$r2_q / r2_scale)
+  if(!is.null(min_LD)) out <- out[r2 > min_LD]
+  #edges at or below the floor were never written, so no threshold below it can be extracted
+  setattr(out, "ld_floor", if(is.null(tbl$metadata$min_r2)) NA_real_ else as.numeric(tbl$metadata$min_r2))
+  out
+}
+
+## SNP columns of the int8 genotype matrix written by vcf_to_012.py (individuals x SNPs, -1 = missing)
+## the .npy is in Fortran (column-major) order, so the SNPs of one chromosome are one contiguous block of the file
+## and only that block is read
+read_012_npy <- function(npy_file, cols = NULL){
+  con <- file(npy_file, "rb")
+  on.exit(close(con))
+  version <- as.integer(readBin(con, "raw", 8)[7])
+  header_len <- if(version == 1) readBin(con, "integer", 1, size = 2, signed = FALSE, endian = "little") else
+    readBin(con, "integer", 1, size = 4, endian = "little")
+  header <- rawToChar(readBin(con, "raw", header_len))
+  if(!grepl("'descr': '|i1'", header, fixed = TRUE) || !grepl("'fortran_order': True", header, fixed = TRUE)){
+    stop(paste0("❌ ", npy_file, " is not a Fortran-order int8 matrix"))
+  }
+  shape <- as.numeric(strsplit(gsub("[^0-9,]", "", sub(".*'shape': \\(([^)]*)\\).*", "\\1", header)), ",")[[1]])
+  n_ind <- shape[1]
+  if(is.null(cols)) cols <- seq_len(shape[2])
+  if(length(cols) == 0) return(matrix(integer(0), nrow = n_ind, ncol = 0))
+  
+  lo <- min(cols)
+  hi <- max(cols)
+  seek(con, seek(con) + (lo - 1) * n_ind)
+  GT <- matrix(readBin(con, "integer", n = n_ind * (hi - lo + 1), size = 1, signed = TRUE), nrow = n_ind)
+  GT <- GT[, cols - lo + 1, drop = FALSE]
+  GT[GT == -1] <- NA
+  GT
+}
+
+## maximum spanning forest of the LD graph: the edges sorted by decreasing r2 and the forest edges in the same order.
+## The LD clusters at any min_LD are the connected components of the forest edges with r2 > min_LD, so every
+## threshold above the floor is extracted from the forest without rebuilding the full graph
+build_ld_merge_tree <- function(geno.LD){
+  chr = unique(geno.LD$CHR)
+  floor = attr(geno.LD, "ld_floor")
+  #idx keeps the order of the LD file, which sets the order of the LD clusters (see order_ld_clusters)
+  edges <- data.table(from = as.character(geno.LD$from), to = as.character(geno.LD$to), r2 = as.numeric(geno.LD$r2),
+                      idx = seq_len(nrow(geno.LD)))
+  setorder(edges, -r2)
+  
+  tree <- edges[0]
+  if(nrow(edges) > 0){
+  g <- graph_from_data_frame(edges, directed = FALSE)
+  #minimum spanning forest on 1 - r2 = maximum spanning forest on r2
+  msf <- mst(g, weights = 1 - E(g)$r2)
+  tree <- setorder(as.data.table(as_data_frame(msf, what = "edges"))[, .(from, to, r2)], -r2)
+  }
+  #without a stored floor (text LD files), only thresholds at or above the weakest loaded edge are safe
+  if(is.null(floor) || is.na(floor)) floor = if(nrow(edges) > 0) min(edges$r2) else 0
+  list(chr = chr, floor = floor, edges = edges, tree = tree)
+}
+
+## LD clusters of a merge tree at one threshold, with the columns and cluster order of get_single_LD_cluster
+ld_clusters_from_tree <- function(merge_tree, min_LD = 0.85, min.cl.size = 20){
+  if(min_LD < merge_tree$floor) stop(paste0("min_LD=", min_LD, " is below the LD floor of the merge tree (", merge_tree$floor, ")"))
+  
+  #both tables are sorted by decreasing r2, so the retained edges are a prefix
+  tree <- merge_tree$tree[seq_len(sum(merge_tree$tree$r2 > min_LD))]
+  
+  out = NULL
+  if(nrow(tree) > 0){
+  g <- graph_from_data_frame(tree[, .(from, to)], directed = FALSE)
+  comp <- components(g)
+  keep <- which(comp$csize >= min.cl.size)
+  
+  if(length(keep) > 0){
+  #mean LD and number of edges count every edge above min_LD, not only the forest edges
+  white.list <- merge_tree$edges[seq_len(sum(merge_tree$edges$r2 > min_LD))][order(idx)]
+  edges <- data.table(cl = comp$membership[match(white.list$from, V(g)$name)], r2 = white.list$r2)
+  stats <- edges[cl %in% keep, .(mean_LD = mean(r2), nE = .N), keyby = cl][J(keep)]
+  nSNPs <- comp$csize[keep]
+  
+  out <- data.table(chr = merge_tree$chr, nSNPs, mean_LD = stats$mean_LD, nE = stats$nE, c = stats$nE/nSNPs,
+                    SNPs = unname(split(V(g)$name, comp$membership)[as.character(keep)]))
+  out <- order_ld_clusters(out, white.list)
+  }
+  }
+  return(out)
+}
+
 get_single_LD_cluster <- function(geno.LD, min_LD = 0.85, min.cl.size = 20){
   
   chr = unique(geno.LD$CHR) 
@@ -19,58 +120,89 @@ get_single_LD_cluster <- function(geno.LD, min_LD = 0.85, min.cl.size = 20){
   if(nrow(white.list) > 1){
   #Parse the edge data to create a graph object
   g <- graph_from_edgelist(apply(white.list[,c("from", "to")], 2, function(o) as.character(o)), directed = FALSE)
-  #Decompose the graph object into a list of components (i.e., LD clusters) and only keep the components containing at least min.cl.size number of vertices (i.e., SNPs)
-  d_g <- decompose(g, min.vertices = min.cl.size)
-  #For each component (i.e., LD cluster), create a vertex sequence (vs) containing all graph vertices (i.e., SNPs named by positions on this chr)
-  d_g <- lapply(d_g, function(cl) V(cl)$name)
-  
-  #Summerize data for each LD cluster
-  out <- rbindlist(mclapply(d_g, function(dg){
-    #number of SNPs (nodes)
-    nSNPs <- length(dg)
-    #mean LD among SNPs in the LD cluster (edge weight)
-    mean_LD <- mean(as.numeric(white.list[white.list$from %in% dg & white.list$to %in% dg, "r2"]))
-    #number of SNP pairs having high LD in this cluseter (retained edges)
-    nE <- nrow(white.list[white.list$from %in% dg & white.list$to %in% dg, ])
-    #retained number of edges/nodes as an approximate of clustering coefficiency (higher c means tighter clustering)
-    c <- nE/nSNPs
-    data.table(chr, nSNPs, mean_LD, nE, c, SNPs=list(dg))
-  },mc.cores=ncores))
+  #Label every vertex (i.e., SNP named by its position on this chr) with its connected component (i.e., LD cluster) once,
+  #and only keep the components containing at least min.cl.size number of vertices
+  comp <- components(g)
+  keep <- which(comp$csize >= min.cl.size)
+  
+  if(length(keep) > 0){
+  #Both ends of an edge are in the same component, so the component of "from" labels the edge
+  edges <- data.table(cl = comp$membership[match(as.character(white.list$from), V(g)$name)],
+                      r2 = as.numeric(white.list$r2))
+  #Summerize data for each LD cluster in one grouped pass over the retained edges
+  #mean LD among SNPs in the LD cluster (edge weight) and number of SNP pairs having high LD in this cluster (retained edges)
+  stats <- edges[cl %in% keep, .(mean_LD = mean(r2), nE = .N), keyby = cl][J(keep)]
+  #number of SNPs (nodes)
+  nSNPs <- comp$csize[keep]
+  
+  out <- data.table(chr, nSNPs, mean_LD = stats$mean_LD, nE = stats$nE,
+                    #retained number of edges/nodes as an approximate of clustering coefficiency (higher c means tighter clustering)
+                    c = stats$nE/nSNPs,
+                    SNPs = unname(split(V(g)$name, comp$membership)[as.character(keep)]))
+  out <- order_ld_clusters(out, white.list)
+  }
   }
   return(out)  
 }
 
+## LD clusters in the order igraph gives the components of the full LD graph above min_LD: clusters by the
+## first appearance of one of their SNPs in the (from, to) edges of white.list in LD file order, and the SNPs of
+## a cluster by first appearance. Cluster ids then do not depend on whether the clusters come from the full
+## graph (get_single_LD_cluster) or from the merge tree of the sweep (ld_clusters_from_tree)
+order_ld_clusters <- function(out, white.list){
+  first <- unique(as.character(rbind(white.list$from, white.list$to)))
+  rank <- lapply(out$SNPs, function(snps) match(snps, first))
+  out$SNPs <- mapply(function(snps, r) snps[order(r)], out$SNPs, rank, SIMPLIFY = FALSE, USE.NAMES = FALSE)
+  out[order(sapply(rank, min))]
+}
+
 
 eucl <- function(i, j){ sqrt((i[,1]-j[1])^2 + (i[,2]-j[2])^2 ) }
 
 
+## PC1/PC2 of one LD cluster from its in-memory genotype block (individuals x SNPs), computed as snpgdsPCA does:
+## SNPs standardized by (g-2p)/sqrt(p(1-p)) with missing genotypes set to 0 and monomorphic SNPs dropped,
+## and PVEs relative to the top eigen.cnt eigenvalues; only the two leading singular vectors are computed
+cluster_pca <- function(gt, eigen.cnt=32){
+  p <- colMeans(gt, na.rm=TRUE)/2
+  poly <- !is.na(p) & p > 0 & p < 1
+  x <- sweep(gt[, poly, drop=FALSE], 2, 2*p[poly])
+  x <- sweep(x, 2, sqrt(p[poly]*(1-p[poly])), "/")
+  x[is.na(x)] <- 0
+  s <- svd(x, nu=2, nv=0)
+  eigenval <- head(s$d^2, eigen.cnt)
+  list(PC1=s$u[,1], PC2=s$u[,2], PVE=eigenval[1]/sum(eigenval), PVE2=eigenval[2]/sum(eigenval))
+}
+
+
 ## process data
-get_data_output = function(data_cls, GT, map, pop, sex_info=T, heterog_homog = c(0.5, 0.5), cores=1){
+## per-cluster metrics; only needs the genotypes of the clusters' own chromosome(s)
+## with checkpoint_dir, clusters are processed in chunks of chunk_size and every finished chunk is saved there,
+## so a rerun after a crash only recomputes the missing chunks
+get_cluster_metrics = function(data_cls, GT, map, pop, sex_info=T, heterog_homog = c(0.5, 0.5), cores=1,
+                               checkpoint_dir=NULL, chunk_size=100){
   
-  cat("Generating gds file \n")
-  name <- paste0("file.gds")
-  snpgdsCreateGeno(name, genmat = t(GT),sample.id = 1:nrow(GT), snp.id = map$SNP, snpfirstdim=TRUE)
-  file_gds <- snpgdsOpen(name)
+  cat("Indexing SNPs \n")
+  #genotype columns of every cluster, from a single lookup of all clustered SNPs
+  snp_col <- match(unlist(data_cls$SNPs), map$SNP)
+  cl_cols <- split(snp_col, rep(seq_len(nrow(data_cls)), lengths(data_cls$SNPs)))
+  cl_cols <- lapply(cl_cols, function(i) i[!is.na(i)])
   
-  cat("Processing data \n")
-  data_out <- rbindlist(mclapply(1:nrow(data_cls), function(cl){
+  cluster_metrics <- function(cl){
     cl_info <- data_cls[cl,]
-    SNPs <- cl_info$SNPs[[1]]
-    gt <- GT[,which(map$SNP %in% SNPs)]
+    gt <- GT[, cl_cols[[cl]], drop=FALSE]
     
-    #if(nrow(gt) > 0){}
-    pca <- snpgdsPCA(file_gds, snp.id = cl_info$SNPs[[1]], verbose = FALSE)
-    PC1 <- as.matrix(pca$eigenvect[,1])
-    PVE <- pca$eigenval[1]/sum(na.omit(pca$eigenval))
-    PC2 <- as.matrix(pca$eigenvect[,2])
-    PVE2 <- pca$eigenval[2]/sum(na.omit(pca$eigenval))
-    rm(pca)
-    het <- apply(gt, 1, function(x) length(which(x==1))/length(na.omit(x)))
+    pca <- cluster_pca(gt)
+    PC1 <- pca$PC1
+    PVE <- pca$PVE
+    PC2 <- pca$PC2
+    PVE2 <- pca$PVE2
+    het <- rowSums(gt == 1, na.rm=TRUE)/rowSums(!is.na(gt))
     
     ## polarize so correlation always positive
-    my.cor = cor(het,PC1,use = "pair")[1,1]
+    my.cor = cor(het,PC1,use = "pair")
     if(!(is.na(my.cor)) & my.cor<0) PC1 <- -PC1   
-    data <- data.table(PC1=as.vector(PC1),Het=het)
+    data <- data.table(PC1=PC1,Het=het)
     data$PC2 = PC2
     
     ## Note: individuals having only missing data would have het == NaN, which would be discarded in R2 estimations
@@ -118,11 +250,37 @@ get_data_output = function(data_cls, GT, map, pop, sex_info=T, heterog_homog = c
         )]}
     
     return(as.data.frame(cl_info[, .(chr, nSNPs, mean_LD, nE, c, R2, PVE, PVE2, Dext_mean, Dext_max, Dext_var, Sex_g, chi2, SNPs, data=list(data))]))
-  },mc.cores=cores))
+  }
+  
+  cat("Processing data \n")
+  #forked workers only read GT, so chunks can run in parallel safely
+  chunks <- split(seq_len(nrow(data_cls)), ceiling(seq_len(nrow(data_cls))/chunk_size))
+  if(!is.null(checkpoint_dir)) dir.create(checkpoint_dir, showWarnings=FALSE, recursive=TRUE)
+  data_out <- mclapply(seq_along(chunks), function(k){
+    #first SNP of every cluster, to tell a checkpoint of these clusters from a stale one
+    ids <- sapply(data_cls$SNPs[chunks[[k]]], `[`, 1)
+    chunk_file <- if(!is.null(checkpoint_dir)) file.path(checkpoint_dir, sprintf("chunk_%05d.rds", k))
+    if(!is.null(chunk_file) && file.exists(chunk_file)){
+      saved <- readRDS(chunk_file)
+      if(identical(saved$ids, ids)) return(saved$data)
+    }
+    data <- rbindlist(lapply(chunks[[k]], cluster_metrics))
+    if(!is.null(chunk_file)){
+      saveRDS(list(ids=ids, data=data), paste0(chunk_file, ".tmp"))
+      file.rename(paste0(chunk_file, ".tmp"), chunk_file)
+    }
+    data
+  },mc.cores=cores)
+  
+  failed <- sapply(data_out, inherits, "try-error")
+  if(any(failed)) stop(data_out[failed][[1]])
   
-  cat("Closing gds file and returning data \n\n")
-  snpgdsClose(file_gds)
-  system("rm file.gds")
+  cat("Returning data \n\n")
+  return(rbindlist(data_out))
+}
+
+## cluster ids and ranks; needs the metrics of all clusters genome-wide
+rank_clusters = function(data_out){
   
   # cluster ID
   data_out[,cluster:=1:nrow(data_out)]
@@ -138,22 +296,110 @@ get_data_output = function(data_cls, GT, map, pop, sex_info=T, heterog_homog = c
   return(data_out)
 }
 
+## split results store of the ranked LD clusters (data_out of get_candidate_regions), instead of one RDS of everything:
+##   clusters.parquet      one row per cluster: metrics, ranks, p-values and region
+##   cluster_snps.parquet  the SNPs of every cluster (cluster, SNP, pos)
+##   cluster_data.parquet  the per-individual PC/Het data, sorted by cluster in row groups of cl_per_group clusters,
+##                         so reading some clusters only decodes the row groups that hold them
+write_results_store <- function(data_out, store_dir, cl_per_group = 64){
+  dir.create(store_dir, showWarnings = FALSE, recursive = TRUE)
+  pos <- lapply(data_out$SNPs, function(snps) as.integer(sub(".*_", "", snps)))
+  
+  clusters <- data_out[, names(data_out)[!sapply(data_out, is.list)], with = FALSE]
+  clusters[, `:=`(start = sapply(pos, min), end = sapply(pos, max))]
+  clusters[, region := paste0(chr, ":", start, "-", end)]
+  arrow::write_parquet(clusters[order(cluster)], file.path(store_dir, "clusters.parquet"))
+  
+  snps <- data.table(cluster = rep(data_out$cluster, lengths(pos)), SNP = unlist(data_out$SNPs), pos = unlist(pos))
+  arrow::write_parquet(snps[order(cluster, pos)], file.path(store_dir, "cluster_snps.parquet"))
+  
+  ord <- order(data_out$cluster)
+  data <- rbindlist(lapply(ord, function(i) data.table(cluster = data_out$cluster[i], data_out$data[[i]])), use.names = TRUE, fill = TRUE)
+  n_ind <- if(length(ord) > 0) nrow(data_out$data[[ord[1]]]) else 1
+  arrow::write_parquet(data, file.path(store_dir, "cluster_data.parquet"), chunk_size = max(n_ind, 1) * cl_per_group)
+}
+
+## clusters of a results store (all when ids is NULL), with their per-individual data in a "data" list column
+## when data = TRUE, as in data_out; only the row groups of the requested clusters are read
+read_results_store <- function(store_dir, ids = NULL, data = FALSE){
+  clusters <- as.data.table(arrow::read_parquet(file.path(store_dir, "clusters.parquet")))
+  if(!is.null(ids)) clusters <- clusters[cluster %in% ids]
+  
+  wanted <- clusters$cluster
+  snps <- arrow::open_dataset(file.path(store_dir, "cluster_snps.parquet"))
+  snps <- as.data.table(dplyr::collect(dplyr::filter(snps, cluster %in% wanted)))
+  set(clusters, j = "SNPs", value = list(unname(split(snps$SNP, factor(snps$cluster, levels = wanted)))))
+  
+  if(data){
+    ind <- arrow::open_dataset(file.path(store_dir, "cluster_data.parquet"))
+    ind <- as.data.table(dplyr::collect(dplyr::filter(ind, cluster %in% wanted)))
+    ind <- split(ind[, !"cluster"], factor(ind$cluster, levels = wanted))
+    set(clusters, j = "data", value = list(unname(ind)))
+  }
+  clusters
+}
+
+get_data_output = function(data_cls, GT, map, pop, sex_info=T, heterog_homog = c(0.5, 0.5), cores=1){
+  rank_clusters(get_cluster_metrics(data_cls, GT, map, pop, sex_info, heterog_homog, cores))
+}
+
+## rank-sum null: nPerm permutations of every rank column, summed over the columns and sorted within each permutation
+## all permutations of a column are drawn at once: order by permutation block, then by a uniform key within the block
+permute_rank_sums <- function(rank_mat, nPerm){
+  n <- nrow(rank_mat)
+  block <- rep(seq_len(nPerm), each=n)
+  sums <- 0
+  for(j in seq_len(ncol(rank_mat))){
+    idx <- order(block, runif(n*nPerm))
+    sums <- sums + rank_mat[(idx-1) %% n + 1, j]
+  }
+  sums <- matrix(sums, nrow=n)
+  matrix(sums[order(col(sums), sums)], nrow=n)
+}
+
 ## get candidate regions
-get_candidate_regions <- function(data_out, ranks=c("Dext_var_rank", "R2_rank","nSNPs_rank","chi2_rank"), nPerm=10000, cores=1, alpha=0.05){
+## min_exceed > 0 switches on sequential Monte-Carlo p-values (Besag & Clifford 1991): a cluster stops accumulating
+## null values once min_exceed of them fall below its observed rank, and permutations stop once every cluster has stopped
+get_candidate_regions <- function(data_out, ranks=c("Dext_var_rank", "R2_rank","nSNPs_rank","chi2_rank"), nPerm=10000, cores=1, alpha=0.05,
+                                  min_exceed=0, batch_cells=1e7){
   
   rank=rowSums(data_out[,..ranks])
   data_out[,rank:=rank]
   setorder(data_out,rank)
   
   cat("Estimating p-values (rank permutation) \n\n")
-  exp <- do.call(cbind, mclapply(1:nPerm, function(x){
-    sort(rowSums(apply(data_out[,..ranks],2,sample)),decreasing = FALSE)
-  },mc.cores = cores))
-  
-  data_out[,rank_exp:=as.integer(rowMeans(exp))]
+  rank_mat <- as.matrix(data_out[,..ranks])
   obs <- data_out[,rank]
-  null <- unlist(exp)
-  p <- unlist(mclapply(obs,function(x) (sum(null<x)+1)/(length(null)+1),mc.cores = cores))
+  n <- length(obs)
+  
+  ## the null is never kept whole: each batch of permutations adds to the running sum of the sorted rank sums (rank_exp)
+  ## and to the number of null values below each observed rank, counted by binary search in the sorted batch
+  batch <- max(1, min(nPerm, floor(batch_cells/n)))
+  sum_exp <- numeric(n)
+  below <- numeric(n)
+  n_null <- numeric(n)
+  stopped <- rep(FALSE, n)
+  done <- 0
+  while(done < nPerm && !all(stopped)){
+    sizes <- pmin(batch, nPerm - done - (seq_len(cores)-1)*batch)
+    sizes <- sizes[sizes > 0]
+    res <- mclapply(sizes, function(b){
+      null <- permute_rank_sums(rank_mat, b)
+      list(sum=rowSums(null), below=findInterval(obs, sort.int(as.vector(null)), left.open=TRUE), n=length(null))
+    },mc.cores = cores)
+    if(any(sapply(res, inherits, "try-error"))) stop(res[sapply(res, inherits, "try-error")][[1]])
+    for(r in res){
+      sum_exp <- sum_exp + r$sum
+      below[!stopped] <- below[!stopped] + r$below[!stopped]
+      n_null[!stopped] <- n_null[!stopped] + r$n
+    }
+    done <- done + sum(sizes)
+    if(min_exceed > 0) stopped <- below >= min_exceed
+  }
+  if(done < nPerm) cat("All clusters reached", min_exceed, "null exceedances after", done, "permutations \n\n")
+  
+  data_out[,rank_exp:=as.integer(sum_exp/done)]
+  p <- (below+1)/(n_null+1)
   
   ## check and corret for p-value inflation
   cat("Checking and correcting p-value inflation \n\n")
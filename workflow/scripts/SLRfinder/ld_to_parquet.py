@@ -0,0 +1,31 @@
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ld import write_ld_parquet
+
+# -----------------------------
+# ARGPARSE
+# -----------------------------
+parser = argparse.ArgumentParser(description="Convert a vcftools .geno.ld edge list to the compact Parquet LD format")
+parser.add_argument("--input", required=True, help="Input .geno.ld (CHR, POS1, POS2, N_INDV, R^2)")
+parser.add_argument("--output", required=True, help="Output .ld.parquet")
+parser.add_argument("--min_r2", type=float, default=0.0, help="Only keep edges with r² above this floor")
+args = parser.parse_args()
+
+# -----------------------------
+# CONVERT
+# -----------------------------
+chrom, kept = None, []
+for chunk in pd.read_csv(args.input, sep=r"\s+", header=0, names=["CHR", "POS1", "POS2", "N_INDV", "R2"],
+                         na_values=["-nan", "nan"], chunksize=5_000_000):
+    if chrom is None and len(chunk):
+        chrom = str(chunk["CHR"].iloc[0])
+    kept.append(chunk[chunk["R2"] > args.min_r2])
+edges = pd.concat(kept) if kept else pd.DataFrame(columns=["POS1", "POS2", "N_INDV", "R2"])
+write_ld_parquet(args.output, chrom, edges["POS1"].to_numpy(), edges["POS2"].to_numpy(),
+                 edges["N_INDV"].to_numpy(), edges["R2"].to_numpy(), args.min_r2)
+print(f"✅ Wrote {len(edges)} LD edges with r² > {args.min_r2} to {args.output}")
@@ -0,0 +1,225 @@
+import argparse
+import os
+import sys
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+import pysam
+from cyvcf2 import VCF
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ld import LD_HEADER, windowed_r2, write_ld_parquet
+
+# -----------------------------
+# ARGPARSE
+# -----------------------------
+parser = argparse.ArgumentParser(
+    description="Filter a VCF (bcftools view + vcftools filters of SLRfinder) and estimate windowed genotype r² in one pass"
+)
+parser.add_argument("--vcf", required=True, help="Input VCF (bgzipped and indexed for chunked processing)")
+parser.add_argument("--out_vcf", required=True, help="Filtered bgzipped VCF (a tabix index is written next to it)")
+parser.add_argument("--out_ld", required=True, help="Output LD edge list: compact Parquet if it ends in .parquet, else .geno.ld text")
+parser.add_argument("--min_ac", type=int, default=1, help="Minimum ALT allele count (bcftools --min-ac)")
+parser.add_argument("--min_gq", type=float, default=20, help="Genotypes below this GQ are set missing (vcftools --minGQ)")
+parser.add_argument("--min_q", type=float, default=30, help="Minimum site QUAL (vcftools --minQ)")
+parser.add_argument("--maf", type=float, default=0.15, help="Minimum minor allele frequency (vcftools --maf)")
+parser.add_argument("--max_missing", type=float, default=0.75, help="Minimum fraction of called genotypes (vcftools --max-missing)")
+parser.add_argument("--ld_window", type=int, default=100, help="Maximum number of SNPs between two SNPs tested for LD")
+parser.add_argument("--min_r2", type=float, default=0.0, help="Only write edges with r² above this floor")
+parser.add_argument("--threads", type=int, default=1, help="Number of genomic chunks processed in parallel")
+args = parser.parse_args()
+
+# Empty BGZF block that terminates every BGZF file
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+FLUSH_SNPS = 4096
+
+# -----------------------------
+# FUNCTIONS
+# -----------------------------
+def keep_variant(v):
+    """
+    Apply the site and genotype filters to one record. Returns the masked 0/1/2
+    dosages (-1 = missing) and whether genotypes were masked, or None if the site fails.
+    """
+    # bcftools view -m2 -M2 -v snps -i 'FILTER="PASS"' --min-ac
+    # cyvcf2 reports FILTER=None for both PASS and '.', only FILTERS tells them apart
+    if v.FILTERS != ["PASS"] or len(v.ALT) != 1 or len(v.REF) != 1 or len(v.ALT[0]) != 1 or v.ALT[0] in ".*":
+        return None
+    dosage = v.gt_types.astype(np.int8)
+    dosage[dosage == 3] = -1
+    if dosage[dosage > 0].sum() < args.min_ac:
+        return None
+
+    # vcftools --minQ, then --minGQ before --maf/--max-missing
+    if v.QUAL is None or v.QUAL < args.min_q:
+        return None
+    low_gq = (v.gt_quals < args.min_gq) & (dosage >= 0)
+    dosage[low_gq] = -1
+
+    called = dosage >= 0
+    n_called = called.sum()
+    if n_called == 0 or n_called / len(dosage) < args.max_missing:
+        return None
+    alt_freq = dosage[called].sum() / (2 * n_called)
+    if min(alt_freq, 1 - alt_freq) < args.maf:
+        return None
+
+    return dosage, low_gq.any()
+
+
+def process_chunk(task):
+    """
+    Filter the SNPs of one chunk (a region, or the whole file), write the kept
+    records to a BGZF part and compute the r² edges inside the chunk.
+    """
+    index, region, part_path = task
+    vcf = VCF(args.vcf, gts012=True)
+    records = vcf(region) if region else vcf
+
+    if region:
+        start, end = (int(x) for x in region.rsplit(":", 1)[1].split("-"))
+
+    carry, carry_pos = np.empty((0, len(vcf.samples)), dtype=np.int8), np.empty(0, dtype=np.int64)
+    pending, pending_pos = [], []
+    head, head_pos = [], []
+    edges = []
+    chrom = None
+    n_snps = 0
+
+    def flush():
+        nonlocal carry, carry_pos
+        dosage = np.vstack([carry] + pending)
+        pos = np.concatenate([carry_pos, pending_pos])
+        i, j, n, r2 = windowed_r2(dosage, args.ld_window, args.min_r2, start=len(carry))
+        edges.append((pos[i], pos[j], n, r2))
+        carry, carry_pos = dosage[-args.ld_window:], pos[-args.ld_window:]
+        pending.clear()
+        pending_pos.clear()
+
+    out = pysam.BGZFile(part_path, "wb")
+    for v in records:
+        # Region queries also return records starting before the region
+        if region and not start <= v.POS <= end:
+            continue
+        kept = keep_variant(v)
+        if kept is None:
+            continue
+        dosage, masked = kept
+        if masked:
+            v.genotypes = [[-1, -1, False] if d < 0 else g for d, g in zip(dosage, v.genotypes)]
+        out.write(str(v).encode())
+
+        chrom = v.CHROM
+        n_snps += 1
+        if len(head) < args.ld_window:
+            head.append(dosage)
+            head_pos.append(v.POS)
+        pending.append(dosage[None, :])
+        pending_pos.append(v.POS)
+        if len(pending) == FLUSH_SNPS:
+            flush()
+    out.close()
+
+    if pending:
+        flush()
+
+    return {
+        "index": index,
+        "chrom": chrom,
+        "n_snps": n_snps,
+        "head": (np.array(head, dtype=np.int8).reshape(-1, carry.shape[1]), np.array(head_pos, dtype=np.int64)),
+        "tail": (carry, carry_pos),
+        "edges": [np.concatenate(x) for x in zip(*edges)] if edges else None,
+    }
+
+
+def chunk_regions(vcf_path, n_chunks):
+    """Split the chromosome of an indexed VCF into ``n_chunks`` equal spans, or None if it cannot be split."""
+    if n_chunks <= 1 or not any(os.path.exists(vcf_path + ext) for ext in (".tbi", ".csi")):
+        return None
+    vcf = VCF(vcf_path)
+    first = next(iter(vcf), None)
+    if first is None:
+        return None
+    try:
+        length = dict(zip(vcf.seqnames, vcf.seqlens))[first.CHROM]
+    except (KeyError, AttributeError, ValueError):
+        return None
+    bounds = np.linspace(0, length, n_chunks + 1).astype(np.int64)
+    return [f"{first.CHROM}:{lo + 1}-{hi}" for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+
+def strip_eof(path):
+    """Raw BGZF blocks of a part file without its terminating EOF block."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return data[:-len(BGZF_EOF)] if data.endswith(BGZF_EOF) else data
+
+
+# -----------------------------
+# MAIN
+# -----------------------------
+if __name__ == "__main__":
+    regions = chunk_regions(args.vcf, args.threads)
+    if regions is None:
+        if args.threads > 1 and not any(os.path.exists(args.vcf + ext) for ext in (".tbi", ".csi")):
+            print(f"⚠️  {args.vcf} has no .tbi/.csi index: processing it on 1 process instead of {args.threads}", file=sys.stderr)
+        print("Processing the VCF as a single stream")
+        regions = [None]
+    else:
+        print(f"Processing {len(regions)} chunks on {args.threads} processes")
+
+    tasks = [(k, region, f"{args.out_vcf}.part{k}") for k, region in enumerate(regions)]
+    with Pool(min(args.threads, len(tasks))) as pool:
+        chunks = sorted(pool.map(process_chunk, tasks), key=lambda c: c["index"])
+
+    # Stitch the filtered VCF: header, then the chunk parts in genomic order
+    header_path = f"{args.out_vcf}.header"
+    with pysam.BGZFile(header_path, "wb") as out:
+        out.write(VCF(args.vcf).raw_header.encode())
+    with open(args.out_vcf, "wb") as out:
+        for path in [header_path] + [t[2] for t in tasks]:
+            out.write(strip_eof(path))
+            os.remove(path)
+        out.write(BGZF_EOF)
+    pysam.tabix_index(args.out_vcf, preset="vcf", force=True)
+
+    # Pairs spanning chunk boundaries: the last ld_window SNPs seen so far against
+    # the first ld_window SNPs of the next chunk
+    edges = [c["edges"] for c in chunks if c["edges"] is not None]
+    tail, tail_pos = None, None
+    for c in chunks:
+        if c["n_snps"] == 0:
+            continue
+        head, head_pos = c["head"]
+        if tail is not None:
+            dosage = np.vstack([tail, head])
+            pos = np.concatenate([tail_pos, head_pos])
+            i, j, n, r2 = windowed_r2(dosage, args.ld_window, args.min_r2, start=len(tail))
+            cross = i < len(tail)
+            edges.append([pos[i[cross]], pos[j[cross]], n[cross], r2[cross]])
+        chunk_tail, chunk_tail_pos = c["tail"]
+        if tail is None or c["n_snps"] >= args.ld_window:
+            tail, tail_pos = chunk_tail, chunk_tail_pos
+        else:
+            tail = np.vstack([tail, chunk_tail])[-args.ld_window:]
+            tail_pos = np.concatenate([tail_pos, chunk_tail_pos])[-args.ld_window:]
+
+    chrom = next((c["chrom"] for c in chunks if c["chrom"] is not None), None)
+    n_snps = sum(c["n_snps"] for c in chunks)
+    if edges:
+        pos1, pos2, n, r2 = (np.concatenate(x) for x in zip(*edges))
+    else:
+        pos1 = pos2 = n = np.empty(0, dtype=np.int64)
+        r2 = np.empty(0)
+    if args.out_ld.endswith(".parquet"):
+        write_ld_parquet(args.out_ld, chrom, pos1, pos2, n, r2, args.min_r2)
+    else:
+        with open(args.out_ld, "w") as out:
+            out.write(LD_HEADER + "\n")
+            order = np.lexsort((pos2, pos1))
+            for a, b, c, d in zip(pos1[order], pos2[order], n[order], r2[order]):
+                out.write(f"{chrom}\t{a}\t{b}\t{c}\t{d:.6g}\n")
+
+    print(f"Kept {n_snps} SNPs and wrote {sum(len(e[0]) for e in edges)} LD edges with r² > {args.min_r2}")
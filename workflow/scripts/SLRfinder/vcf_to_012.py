@@ -0,0 +1,103 @@
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+from cyvcf2 import VCF
+
+# -----------------------------
+# ARGPARSE
+# -----------------------------
+parser = argparse.ArgumentParser(
+    description="Extract the 012 genotypes of whitelisted SNPs of several chromosomes into one int8 matrix (vcftools --012 layout)"
+)
+parser.add_argument("--vcf", nargs="+", required=True, help="Filtered VCFs, one per chromosome")
+parser.add_argument("--whitelist", nargs="+", required=True, help="SNP whitelists (CHROM and POS columns), one per VCF, in the same order")
+parser.add_argument("--out", required=True, help="Output prefix: {out}.012.npy, {out}.012.pos and {out}.012.indv")
+parser.add_argument("--threads", type=int, default=1, help="Number of chromosomes extracted in parallel")
+args = parser.parse_args()
+
+# -----------------------------
+# FUNCTIONS
+# -----------------------------
+def read_whitelist(path):
+    """Chromosome and sorted unique positions of a whitelist; header or malformed lines are skipped."""
+    chrom, positions = None, []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 2 and fields[1].isdigit():
+                chrom = chrom or fields[0]
+                positions.append(int(fields[1]))
+    return chrom, np.unique(np.array(positions, dtype=np.int64))
+
+
+def extract_chromosome(task):
+    """
+    Stream one VCF and write the dosages (0/1/2, -1 = missing) of its whitelisted
+    SNPs into their columns of the shared matrix. Returns the number of SNPs found.
+    """
+    vcf_path, positions, first_col, npy_path = task
+    gt = np.load(npy_path, mmap_mode="r+")
+    found = np.zeros(len(positions), dtype=bool)
+    for v in VCF(vcf_path, gts012=True):
+        k = np.searchsorted(positions, v.POS)
+        if k == len(positions) or positions[k] != v.POS or found[k]:
+            continue
+        dosage = v.gt_types.astype(np.int8)
+        dosage[dosage == 3] = -1
+        # Fortran order: the samples of one SNP are contiguous on disk
+        gt[:, first_col + k] = dosage
+        found[k] = True
+        if found.all():
+            break
+    gt.flush()
+    return int(found.sum())
+
+
+# -----------------------------
+# MAIN
+# -----------------------------
+if __name__ == "__main__":
+    if len(args.vcf) != len(args.whitelist):
+        raise ValueError("--vcf and --whitelist need one file per chromosome, in the same order")
+
+    samples = VCF(args.vcf[0]).samples
+    whitelists = [read_whitelist(path) for path in args.whitelist]
+    n_snps = [len(positions) for _, positions in whitelists]
+    first_cols = np.concatenate([[0], np.cumsum(n_snps)[:-1]]).astype(np.int64)
+
+    # Preallocated individuals x SNPs matrix, every genotype missing until it is extracted
+    npy_path = f"{args.out}.012.npy"
+    gt = np.lib.format.open_memmap(npy_path, mode="w+", dtype=np.int8,
+                                   shape=(len(samples), sum(n_snps)), fortran_order=True)
+    gt[:] = -1
+    gt.flush()
+    del gt
+
+    tasks = []
+    for vcf_path, (chrom, positions), first_col in zip(args.vcf, whitelists, first_cols):
+        if len(positions) == 0:
+            continue
+        if VCF(vcf_path).samples != samples:
+            raise ValueError(f"{vcf_path} does not have the samples of {args.vcf[0]} in the same order")
+        tasks.append((vcf_path, positions, int(first_col), npy_path))
+
+    print(f"Extracting {sum(n_snps)} SNPs of {len(samples)} individuals from {len(tasks)} chromosome(s) on {args.threads} processes")
+    if args.threads > 1 and len(tasks) > 1:
+        with Pool(min(args.threads, len(tasks))) as pool:
+            found = pool.map(extract_chromosome, tasks)
+    else:
+        found = [extract_chromosome(task) for task in tasks]
+
+    for (vcf_path, positions, _, _), n_found in zip(tasks, found):
+        if n_found < len(positions):
+            print(f"⚠️  {len(positions) - n_found} whitelisted SNPs not found in {vcf_path}, left missing")
+
+    # SNP map and sample order, as vcftools writes them
+    with open(f"{args.out}.012.pos", "w") as out:
+        for chrom, positions in whitelists:
+            out.writelines(f"{chrom}\t{pos}\n" for pos in positions)
+    with open(f"{args.out}.012.indv", "w") as out:
+        out.writelines(f"{sample}\n" for sample in samples)
+
+    print(f"✅ Wrote {args.out}.012.npy")
@@ -0,0 +1,6 @@
+"""
+Helpers shared by the workflow scripts.
+
+The scripts are run as plain files (``python workflow/scripts/<stage>/<script>.py``),
+so they put ``workflow/scripts`` on ``sys.path`` before importing from here.
+"""
@@ -0,0 +1,94 @@
+"""
+Indexed access to a reference FASTA through its ``samtools faidx`` index.
+
+The FASTA is memory-mapped and bases are located by offset arithmetic on the
+``.fai`` columns (sequence offset, bases per line, bytes per line), so only the
+pages holding the requested bases are read. Fixed-size blocks of recently
+touched sequence are kept in a small LRU cache.
+"""
+import mmap
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+FaiEntry = namedtuple("FaiEntry", ["length", "offset", "linebases", "linewidth"])
+
+
+def read_fai(fai_path):
+    """Parse a ``.fai`` index into a dict of sequence name -> FaiEntry."""
+    index = {}
+    with open(fai_path) as f:
+        for line in f:
+            name, length, offset, linebases, linewidth = line.rstrip("\n").split("\t")[:5]
+            index[name] = FaiEntry(int(length), int(offset), int(linebases), int(linewidth))
+    return index
+
+
+class IndexedFasta:
+    """
+    Memory-mapped FASTA with a faidx index. ``bases`` returns the upper-case ASCII
+    bases at arbitrary 1-based positions of one sequence.
+    """
+
+    def __init__(self, fasta_path, fai_path=None, block_size=1 << 16, cache_blocks=64):
+        self.index = read_fai(fai_path or f"{fasta_path}.fai")
+        self._file = open(fasta_path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.block_size = block_size
+        self.cache_blocks = cache_blocks
+        self._cache = OrderedDict()
+
+    def __contains__(self, seqid):
+        return seqid in self.index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._cache.clear()
+        self._map.close()
+        self._file.close()
+
+    def length(self, seqid):
+        return self.index[seqid].length
+
+    def _block(self, block):
+        """Bytes of one block of the file, from the LRU cache."""
+        data = self._cache.get(block)
+        if data is None:
+            start = block * self.block_size
+            data = np.frombuffer(self._map[start:start + self.block_size], dtype=np.uint8)
+            self._cache[block] = data
+            if len(self._cache) > self.cache_blocks:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(block)
+        return data
+
+    def bases(self, seqid, positions):
+        """Upper-case ASCII bases (uint8) of ``seqid`` at the given 1-based positions."""
+        entry = self.index[seqid]
+        pos = np.asarray(positions, dtype=np.int64) - 1
+        if pos.size and (pos.min() < 0 or pos.max() >= entry.length):
+            raise IndexError(f"Position out of range for {seqid} (length {entry.length})")
+        offsets = entry.offset + (pos // entry.linebases) * entry.linewidth + pos % entry.linebases
+
+        out = np.empty(pos.shape, dtype=np.uint8)
+        blocks = offsets // self.block_size
+        flat_out, flat_offsets, flat_blocks = out.reshape(-1), offsets.reshape(-1), blocks.reshape(-1)
+        order = np.argsort(flat_blocks, kind="stable")
+        bounds = np.flatnonzero(np.diff(flat_blocks[order])) + 1
+        for group in np.split(order, bounds):
+            if len(group) == 0:
+                continue
+            block = int(flat_blocks[group[0]])
+            flat_out[group] = self._block(block)[flat_offsets[group] - block * self.block_size]
+        # Lower-case (soft-masked) bases are returned upper-case
+        return np.where((out >= 97) & (out <= 122), out - 32, out).astype(np.uint8)
+
+    def fetch(self, seqid, start, end):
+        """Sequence of ``seqid`` between 1-based inclusive ``start`` and ``end`` as a string."""
+        return self.bases(seqid, np.arange(start, end + 1)).tobytes().decode()
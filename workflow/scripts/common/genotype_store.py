@@ -0,0 +1,148 @@
+"""
+Binary genotype store built once from a GATK VariantsToTable ``.tab`` file.
+
+A store is a set of files sharing a prefix:
+
+    {prefix}.gt.npy     int8 ALT dosage (0, 1, 2; -1 = missing), samples x SNPs
+    {prefix}.pos.npy    int32 SNP positions, sorted
+    {prefix}.ref.npy    REF alleles (fixed-width bytes), one per SNP
+    {prefix}.alt.npy    ALT alleles (fixed-width bytes), one per SNP
+    {prefix}.meta.npz   chromosome, sample names and sexes
+
+The ``.npy`` files are memory-mapped on load, so consumers only pay for the
+samples and SNPs they actually touch. The sorted positions double as the region
+index: a region load binary-searches them and slices just that window of SNPs.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+MISSING_GENOTYPES = ("./.", ".|.", ".", "")
+
+GenotypeStore = namedtuple("GenotypeStore", ["chrom", "pos", "ref", "alt", "samples", "sex", "gt"])
+
+
+def infer_sex(name):
+    """Infer the sex of a sample from its name prefix (F/RF females, M/RM males)."""
+    name = name.upper()
+    if name.startswith("F") or name.startswith("RF"):
+        return "F"
+    elif name.startswith("M") or name.startswith("RM"):
+        return "M"
+    else:
+        return "U"
+
+
+def genotype_dosage(genotypes, alts):
+    """
+    Convert a SNPs x samples array of genotype strings (e.g. ``A/T``, ``T|T``)
+    into int8 ALT dosages.
+
+    Strings are factorized once and translated through a lookup table over the
+    distinct (genotype, ALT) codes. Missing and non-diploid calls become -1.
+    """
+    codes, uniques = pd.factorize(np.asarray(genotypes, dtype=object).ravel())
+    alt_codes, alt_uniques = pd.factorize(np.asarray(alts, dtype=object))
+
+    # The extra last row/column absorbs the -1 code pandas gives to missing values.
+    table = np.full((len(uniques) + 1, len(alt_uniques) + 1), -1, dtype=np.int8)
+    for i, geno in enumerate(uniques):
+        if not isinstance(geno, str) or geno in MISSING_GENOTYPES:
+            continue
+        alleles = geno.replace("|", "/").split("/")
+        if len(alleles) != 2 or "." in alleles:
+            continue
+        for j, alt in enumerate(alt_uniques):
+            table[i, j] = alleles.count(alt)
+
+    return table[codes.reshape(np.shape(genotypes)), alt_codes[:, None]]
+
+
+def tab_to_store(tab_path, prefix, chunksize=200_000):
+    """Parse a VariantsToTable file chunk by chunk and write it as a genotype store."""
+    chrom, pos, ref, alt, dosage = [], [], [], [], []
+    samples = None
+
+    for chunk in pd.read_csv(tab_path, sep="\t", dtype=str, keep_default_na=False, chunksize=chunksize):
+        gt_columns = [col for col in chunk.columns if col.endswith(".GT")]
+        if samples is None:
+            samples = [col[:-len(".GT")] for col in gt_columns]
+        chrom.append(chunk["CHROM"].to_numpy())
+        pos.append(chunk["POS"].astype(np.int32).to_numpy())
+        ref.append(chunk["REF"].to_numpy())
+        alt.append(chunk["ALT"].to_numpy())
+        dosage.append(genotype_dosage(chunk[gt_columns].to_numpy(), chunk["ALT"].to_numpy()))
+
+    if samples is None:
+        raise ValueError(f"{tab_path} contains no variants")
+
+    chroms = np.unique(np.concatenate(chrom))
+    if len(chroms) != 1:
+        raise ValueError(f"{tab_path} spans several chromosomes: {', '.join(chroms)}")
+
+    pos = np.concatenate(pos)
+    if np.any(np.diff(pos) < 0):
+        raise ValueError(f"{tab_path} is not sorted by position")
+
+    np.save(f"{prefix}.gt.npy", np.ascontiguousarray(np.concatenate(dosage).T))
+    np.save(f"{prefix}.pos.npy", pos)
+    np.save(f"{prefix}.ref.npy", np.concatenate(ref).astype("S"))
+    np.save(f"{prefix}.alt.npy", np.concatenate(alt).astype("S"))
+    np.savez(
+        f"{prefix}.meta.npz",
+        chrom=chroms[0],
+        samples=np.array(samples),
+        sex=np.array([infer_sex(s) for s in samples])
+    )
+
+
+def parse_region(region):
+    """Parse ``CHROM:START-END`` or ``START-END`` into (chrom or None, start, end)."""
+    chrom, _, span = region.rpartition(":")
+    start, end = (int(x.replace(",", "")) for x in span.split("-"))
+    if start > end:
+        raise ValueError(f"Invalid region {region}: start is after end")
+    return chrom or None, start, end
+
+
+def load_store(prefix, mmap=True, region=None, pad=0):
+    """
+    Load a genotype store; the genotype matrix, positions and alleles are memory-mapped.
+
+    With ``region`` (a ``CHROM:START-END`` string), only the SNPs inside the window,
+    plus ``pad`` flanking SNPs on each side, are read from disk.
+    """
+    mmap_mode = "r" if mmap or region is not None else None
+    meta = np.load(f"{prefix}.meta.npz")
+    chrom = str(meta["chrom"])
+    pos = np.load(f"{prefix}.pos.npy", mmap_mode=mmap_mode)
+
+    window = slice(None)
+    if region is not None:
+        region_chrom, start, end = parse_region(region)
+        if region_chrom is not None and region_chrom != chrom:
+            raise ValueError(f"Region {region} is not on {chrom}, the chromosome of {prefix}")
+        lo = np.searchsorted(pos, start, side="left")
+        hi = np.searchsorted(pos, end, side="right")
+        window = slice(max(lo - pad, 0), min(hi + pad, len(pos)))
+
+    return GenotypeStore(
+        chrom=chrom,
+        pos=pos[window],
+        ref=np.load(f"{prefix}.ref.npy", mmap_mode=mmap_mode)[window].astype(str),
+        alt=np.load(f"{prefix}.alt.npy", mmap_mode=mmap_mode)[window].astype(str),
+        samples=meta["samples"].astype(str),
+        sex=meta["sex"].astype(str),
+        gt=np.load(f"{prefix}.gt.npy", mmap_mode=mmap_mode)[:, window]
+    )
+
+
+def genotype_strings(store, snp_index):
+    """Rebuild unphased genotype strings of one SNP, keyed like the ``.tab`` columns."""
+    ref, alt = store.ref[snp_index], store.alt[snp_index]
+    calls = {0: f"{ref}/{ref}", 1: f"{ref}/{alt}", 2: f"{alt}/{alt}"}
+    return {
+        f"{sample}.GT": calls.get(int(d), "./.")
+        for sample, d in zip(store.samples, store.gt[:, snp_index])
+    }
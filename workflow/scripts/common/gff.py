@@ -0,0 +1,142 @@
+"""
+Parsed-once GFF3 annotation store.
+
+``gff_to_store`` reads a GFF3 file once and writes it as a Parquet table with the
+nine GFF columns, the ``ID``, ``Name``, ``gene``, ``locus_tag`` and ``Parent``
+attributes already split out, a ``label`` column (the first ``Name``/``gene``/``ID``
+attribute in attribute order, which is how the plots name genes) and the original
+``line`` order. The header directives are kept in the Parquet metadata.
+
+Rows are sorted by seqid and start, and ``max_end`` holds the running maximum of
+``end`` within each seqid. The two sorted columns form the interval index:
+``features_in_region`` binary-searches the rows starting before the region end
+and the rows whose ``max_end`` reaches the region start, then only checks the
+rows in between.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+GFF_COLUMNS = ["seqid", "source", "type", "start", "end", "score", "strand", "phase", "attributes"]
+ATTRIBUTES = ["ID", "Name", "gene", "locus_tag", "Parent"]
+HEADER_KEY = b"gff_header"
+
+
+def read_gff(gff_path):
+    """Parse a GFF3 file into a DataFrame of its feature lines and the list of its header lines."""
+    raw = pd.read_csv(
+        gff_path, sep="\t", header=None, names=GFF_COLUMNS, dtype=str,
+        quoting=3, na_filter=False, skip_blank_lines=True
+    )
+    raw["line"] = np.arange(len(raw))
+
+    # Everything after a ##FASTA directive is sequence, not features
+    fasta = np.flatnonzero(raw["seqid"].to_numpy() == "##FASTA")
+    if len(fasta):
+        raw = raw.iloc[:fasta[0]]
+
+    comment = raw["seqid"].str.startswith("#").to_numpy()
+    first_feature = np.argmin(comment) if not comment.all() else len(raw)
+    header = raw["seqid"].iloc[:first_feature].tolist()
+
+    gff = raw[~comment].reset_index(drop=True)
+    gff["start"] = gff["start"].astype(np.int64)
+    gff["end"] = gff["end"].astype(np.int64)
+    return gff, header
+
+
+def gff_to_store(gff_path, store_path):
+    """Parse a GFF3 file once, split the common attributes and write the sorted store."""
+    gff, header = read_gff(gff_path)
+
+    for key in ATTRIBUTES:
+        gff[key] = gff["attributes"].str.extract(rf"(?:^|;){key}=([^;]*)", expand=False)
+    gff["label"] = gff["attributes"].str.extract(r"(?:^|;)[^;=]*(?:Name|gene|ID)=([^;]*)", expand=False).fillna("unknown")
+
+    gff = gff.sort_values(["seqid", "start", "line"], kind="stable").reset_index(drop=True)
+    gff["max_end"] = gff.groupby("seqid", sort=False)["end"].cummax()
+
+    table = pa.Table.from_pandas(gff, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[HEADER_KEY] = json.dumps(header).encode()
+    pq.write_table(table.replace_schema_metadata(metadata), store_path)
+
+
+def load_gff(store_path, types=None, columns=None):
+    """
+    Load a GFF store, optionally only some feature types and columns. The interval
+    index columns (seqid, start, end, max_end) are always loaded.
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(["seqid", "start", "end", "max_end"] + list(columns)))
+    filters = [("type", "in", list(types))] if types is not None else None
+    gff = pq.read_table(store_path, columns=columns, filters=filters).to_pandas()
+    if types is not None:
+        # max_end must be recomputed over the rows that were kept
+        gff["max_end"] = gff.groupby("seqid", sort=False)["end"].cummax()
+    return gff
+
+
+def gff_header(store_path):
+    """Header lines (``##gff-version`` and other directives) of the original GFF file."""
+    metadata = pq.read_schema(store_path).metadata or {}
+    return json.loads(metadata.get(HEADER_KEY, b"[]"))
+
+
+def seqid_slice(gff, seqid):
+    """Row range of one seqid in a store sorted by seqid."""
+    seqids = gff["seqid"].to_numpy()
+    return slice(np.searchsorted(seqids, seqid, side="left"), np.searchsorted(seqids, seqid, side="right"))
+
+
+def features_in_region(gff, seqid, start, end, types=None):
+    """Features of ``seqid`` overlapping the closed interval [start, end]."""
+    rows = seqid_slice(gff, seqid)
+    starts = gff["start"].to_numpy()[rows]
+    max_ends = gff["max_end"].to_numpy()[rows]
+
+    lo = rows.start + np.searchsorted(max_ends, start, side="left")
+    hi = rows.start + np.searchsorted(starts, end, side="right")
+    hits = gff.iloc[lo:max(lo, hi)]
+    hits = hits[hits["end"].to_numpy() >= start]
+    if types is not None:
+        hits = hits[hits["type"].isin(types)]
+    return hits
+
+
+def select_loci(gff, loci):
+    """
+    Mask of the features of the given loci (matched on ``locus_tag`` or ``ID``) and
+    of all their descendants, following ``Parent`` links down from the matched rows.
+    """
+    loci = set(loci)
+    selected = (gff["locus_tag"].isin(loci) | gff["ID"].isin(loci)).to_numpy().copy()
+
+    # One (row, parent) pair per parent of each feature
+    parents = gff["Parent"].dropna().str.split(",").explode()
+    frontier = set(gff["ID"][selected].dropna())
+    while frontier:
+        children = parents.index[parents.isin(frontier).to_numpy()].unique()
+        new = children[~selected[children]]
+        selected[new] = True
+        frontier = set(gff["ID"].iloc[new].dropna())
+    return selected
+
+
+def write_gff(path, gff, header=(), chunk_size=100_000):
+    """Write the header lines and store rows (in original file order) as GFF3, a chunk at a time."""
+    gff = gff.sort_values("line")
+    with open(path, "w") as out:
+        out.writelines(line + "\n" for line in header)
+        for start in range(0, len(gff), chunk_size):
+            out.writelines(to_gff_lines(gff.iloc[start:start + chunk_size]))
+
+
+def to_gff_lines(gff):
+    """Format store rows back into GFF3 lines, in their original file order."""
+    gff = gff.sort_values("line")
+    fields = gff[GFF_COLUMNS].astype(str)
+    return (fields.agg("\t".join, axis=1) + "\n").tolist()
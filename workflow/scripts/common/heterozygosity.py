@@ -0,0 +1,33 @@
+"""
+Vectorized heterozygosity kernels over int8 dosage blocks (samples x SNPs).
+
+Dosages come from ``common.genotype_store``, where genotype strings were already
+classified once through a lookup table over the distinct genotype codes:
+1 is heterozygous, 0 and 2 are homozygous and -1 is missing.
+"""
+import numpy as np
+import pandas as pd
+
+
+def zygosity_counts(gt):
+    """Per-SNP numbers of heterozygous and homozygous called genotypes."""
+    gt = np.asarray(gt)
+    het = (gt == 1).sum(axis=0)
+    hom = (gt >= 0).sum(axis=0) - het
+    return het, hom
+
+
+def heterozygosity_by_sex(store, snp_index=slice(None)):
+    """
+    Female/male heterozygous and homozygous counts plus mean heterozygosity for the
+    selected SNPs of a genotype store. Samples of unknown sex are left out.
+    """
+    gt = store.gt[:, snp_index]
+    summary = {}
+    for label, code in (("female", "F"), ("male", "M")):
+        het, hom = zygosity_counts(gt[store.sex == code])
+        summary[f"{label}_heterozygous"] = het
+        summary[f"{label}_homozygous"] = hom
+        with np.errstate(invalid="ignore", divide="ignore"):
+            summary[f"{label}_het"] = het / (het + hom)
+    return pd.DataFrame(summary)
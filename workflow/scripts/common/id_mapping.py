@@ -0,0 +1,50 @@
+"""
+Gene identifier index: GFF gene ID (``gene-BLAG_LOCUS...``) <-> locus tag <-> NCBI GeneID.
+
+The index is built once from the GFF store and the NCBI ``gene_info`` table and
+saved as a Parquet table sorted by gene ID. Lists are converted with one
+``Index.get_indexer`` lookup on the source column.
+"""
+import pandas as pd
+
+from common.gff import load_gff
+
+ID_COLUMNS = ["gene_id", "locus_tag", "GeneID"]
+
+
+def build_index(gff_store, gene_info):
+    """Join the GFF genes with gene_info on the locus tag; genes without a GeneID are kept."""
+    genes = load_gff(gff_store, types=["gene"], columns=["ID", "locus_tag"])
+    genes = genes.dropna(subset=["ID"]).rename(columns={"ID": "gene_id"})[["gene_id", "locus_tag"]]
+
+    info = pd.read_csv(gene_info, sep="\t", usecols=["GeneID", "LocusTag"], dtype=str)
+    info = info[info["LocusTag"].notna() & (info["LocusTag"] != "-") & info["GeneID"].str.isdigit()]
+    info = info.drop_duplicates("LocusTag").rename(columns={"LocusTag": "locus_tag"})
+
+    index = genes.merge(info, on="locus_tag", how="left").drop_duplicates("gene_id")
+    index["GeneID"] = index["GeneID"].astype("Int64")
+    return index.sort_values("gene_id").reset_index(drop=True)
+
+
+def load_index(path):
+    return pd.read_parquet(path, columns=ID_COLUMNS)
+
+
+def detect_column(index, ids):
+    """Identifier column of the index that matches most of ``ids``."""
+    hits = {col: pd.Index(index[col].astype(str)).isin(ids).sum() for col in ID_COLUMNS}
+    return max(hits, key=hits.get)
+
+
+def convert(index, ids, source="auto", target="GeneID"):
+    """
+    Convert identifiers from the ``source`` column to the ``target`` column. Returns
+    the converted values in input order, without duplicates or unmapped entries.
+    """
+    ids = pd.Index(pd.unique(pd.Series(ids, dtype=str).str.strip()))
+    if source == "auto":
+        source = detect_column(index, ids)
+    keys = index[[source, target]].dropna().drop_duplicates(source)
+    positions = pd.Index(keys[source].astype(str)).get_indexer(ids)
+    values = keys[target].to_numpy()[positions[positions >= 0]]
+    return pd.unique(values), source
@@ -0,0 +1,102 @@
+"""
+Windowed genotype r² between nearby SNPs, as computed by ``vcftools --geno-r2``.
+
+r² is the squared Pearson correlation of the 0/1/2 dosages of two SNPs over the
+individuals called at both of them. Dosage blocks are SNPs x samples int8 arrays
+with -1 for missing calls. Sums over the jointly called individuals are taken as
+matrix products, so a whole block of SNPs is compared with the previous
+``window`` SNPs at once.
+
+Edge lists are stored as vcftools-style ``.geno.ld`` text or as a compact Parquet
+file (``write_ld_parquet``/``read_ld_parquet``; ``read_ld_edges`` in
+SLRfinder_functions.r reads it from R).
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+LD_HEADER = "CHR\tPOS1\tPOS2\tN_INDV\tR^2"
+
+# Parquet edge lists: uint32 positions, uint16 N_INDV and r² quantized to uint16
+# (r2_q = round(r² * R2_SCALE)), zstd-compressed; the chromosome is in the metadata
+R2_SCALE = 65535
+LD_CHROM_KEY = b"chrom"
+LD_FLOOR_KEY = b"min_r2"
+
+
+def windowed_r2(dosage, window, min_r2=0.0, start=0, block=256):
+    """
+    r² of every SNP pair (i, j) of a dosage block with 0 < j - i <= ``window`` and
+    j >= ``start``, keeping pairs with r² > ``min_r2``.
+
+    Returns the (i, j, n_indv, r2) arrays of the kept pairs, ordered by j then i.
+    """
+    dosage = np.asarray(dosage)
+    called = (dosage >= 0).astype(np.float64)
+    geno = np.where(dosage >= 0, dosage, 0).astype(np.float64)
+    geno2 = geno ** 2
+    block = max(block, window)
+
+    edges = []
+    for a in range(start, len(dosage), block):
+        b = min(a + block, len(dosage))
+        lo = max(a - window, 0)
+        rows, cols = slice(a, b), slice(lo, b)
+
+        n = called[rows] @ called[cols].T
+        sx = called[rows] @ geno[cols].T
+        sx2 = called[rows] @ geno2[cols].T
+        sy = geno[rows] @ called[cols].T
+        sy2 = geno2[rows] @ called[cols].T
+        sxy = geno[rows] @ geno[cols].T
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = sxy / n - (sx / n) * (sy / n)
+            var_x = sx2 / n - (sx / n) ** 2
+            var_y = sy2 / n - (sy / n) ** 2
+            r2 = cov ** 2 / (var_x * var_y)
+
+        j, i = np.meshgrid(np.arange(a, b), np.arange(lo, b), indexing="ij")
+        keep = (j - i > 0) & (j - i <= window) & (r2 > min_r2)
+        edges.append((i[keep], j[keep], n[keep].astype(np.int64), r2[keep]))
+
+    if not edges:
+        return (np.empty(0, dtype=np.int64),) * 3 + (np.empty(0),)
+    return tuple(np.concatenate(part) for part in zip(*edges))
+
+
+def write_ld_parquet(path, chrom, pos1, pos2, n_indv, r2, min_r2=0.0):
+    """Write an LD edge list (sorted by POS1 then POS2) as a compact Parquet file."""
+    pos1, pos2 = np.asarray(pos1), np.asarray(pos2)
+    order = np.lexsort((pos2, pos1))
+    table = pa.table({
+        "pos1": pa.array(pos1[order], type=pa.uint32()),
+        "pos2": pa.array(pos2[order], type=pa.uint32()),
+        "n_indv": pa.array(np.minimum(np.asarray(n_indv)[order], np.iinfo(np.uint16).max), type=pa.uint16()),
+        "r2_q": pa.array(np.rint(np.clip(np.asarray(r2)[order], 0, 1) * R2_SCALE), type=pa.uint16()),
+    })
+    metadata = {LD_CHROM_KEY: str(chrom or "").encode(), LD_FLOOR_KEY: str(min_r2).encode()}
+    pq.write_table(table.replace_schema_metadata(metadata), path, compression="zstd")
+
+
+def read_ld_parquet(path, min_r2=None):
+    """
+    Read a Parquet LD edge list as a DataFrame with the .geno.ld columns
+    (CHR, POS1, POS2, N_INDV, R^2), keeping only edges with r² > ``min_r2``.
+    """
+    filters = None
+    if min_r2 is not None:
+        filters = [("r2_q", ">", int(np.floor(min_r2 * R2_SCALE)))]
+    table = pq.read_table(path, filters=filters)
+    chrom = (table.schema.metadata or {}).get(LD_CHROM_KEY, b"").decode()
+    edges = table.to_pandas()
+    r2 = edges["r2_q"].to_numpy(np.float32) / R2_SCALE
+    keep = r2 > min_r2 if min_r2 is not None else slice(None)
+    return pd.DataFrame({
+        "CHR": chrom,
+        "POS1": edges["pos1"].to_numpy()[keep],
+        "POS2": edges["pos2"].to_numpy()[keep],
+        "N_INDV": edges["n_indv"].to_numpy()[keep],
+        "R^2": r2[keep],
+    })
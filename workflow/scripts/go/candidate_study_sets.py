@@ -0,0 +1,51 @@
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.gff import load_gff, features_in_region
+from common.id_mapping import load_index
+
+# -----------------------------
+# ARGPARSE
+# -----------------------------
+parser = argparse.ArgumentParser(description="Build one GO study set per SLRfinder candidate region and window size")
+parser.add_argument("--candidates", required=True, help="SLRfinder candidates.csv with a 'region' column (chr:start-end)")
+parser.add_argument("--gff_store", required=True, help="Parsed GFF store (.parquet)")
+parser.add_argument("--id_index", required=True, help="Gene ID index (.parquet) from id_mapping.py build")
+parser.add_argument("--chrom_map", help="Two-column file renaming candidate chromosomes to GFF seqids")
+parser.add_argument("--windows", type=int, nargs="+", default=[0], help="Flanks (bp) added on each side of the regions")
+parser.add_argument("--output", required=True, help="Output TSV with set, region, window, gene and GeneID columns")
+args = parser.parse_args()
+
+# -----------------------------
+# Load inputs
+# -----------------------------
+genes = load_gff(args.gff_store, types=["gene"], columns=["ID"])
+index = load_index(args.id_index).dropna(subset=["GeneID"])
+genes["GeneID"] = index.set_index("gene_id")["GeneID"].reindex(genes["ID"]).array
+chrom_map = {}
+if args.chrom_map:
+    with open(args.chrom_map) as f:
+        chrom_map = dict(line.split()[:2] for line in f if line.strip())
+candidates = pd.read_csv(args.candidates)
+
+# -----------------------------
+# Genes of each region and window
+# -----------------------------
+rows = []
+for region in candidates["region"].drop_duplicates():
+    chrom, _, span = region.rpartition(":")
+    start, end = (int(x) for x in span.split("-"))
+    seqid = chrom_map.get(chrom, chrom)
+    for window in args.windows:
+        hits = features_in_region(genes, seqid, max(start - window, 1), end + window)
+        hits = hits[hits["GeneID"].notna()]
+        rows.extend((f"{region}+{window}", region, window, gene_id, geneid)
+                    for gene_id, geneid in zip(hits["ID"], hits["GeneID"]))
+
+sets = pd.DataFrame(rows, columns=["set", "region", "window", "gene", "GeneID"]).drop_duplicates()
+sets.to_csv(args.output, sep="\t", index=False)
+print(f"✅ Wrote {sets['set'].nunique()} study sets with {len(sets)} genes to {args.output}")
@@ -0,0 +1,50 @@
+import argparse
+import gzip
+import io
+import urllib.request
+
+# -----------------------------
+# ARGPARSE
+# -----------------------------
+parser = argparse.ArgumentParser(description="Keep the rows of one taxon from an NCBI gene_info/gene2go dump in one streaming pass")
+parser.add_argument("--source", required=True, help="Local .gz file or URL (ftp/http) of the NCBI dump")
+parser.add_argument("--output", required=True, help="Filtered TSV (header kept)")
+parser.add_argument("--taxid", default="7740", help="NCBI taxonomy ID to keep (default: 7740, Branchiostoma lanceolatum)")
+parser.add_argument("--locus_map", help="gene_info only: also write a locus_tag -> GeneID TSV in the same pass")
+parser.add_argument("--buffer_mb", type=int, default=16, help="Read buffer size (MB)")
+args = parser.parse_args()
+
+# -----------------------------
+# FILTER
+# -----------------------------
+buffer_size = args.buffer_mb << 20
+prefix = args.taxid.encode() + b"\t"
+
+if "://" in args.source:
+    raw = urllib.request.urlopen(args.source)
+else:
+    raw = open(args.source, "rb")
+
+kept = 0
+with raw, io.BufferedReader(gzip.GzipFile(fileobj=raw), buffer_size=buffer_size) as dump, \
+        open(args.output, "wb", buffering=buffer_size) as out:
+    locus_map = open(args.locus_map, "wb") if args.locus_map else None
+
+    header = dump.readline()
+    out.write(header)
+    for line in dump:
+        # The tax_id is the first column: a byte-prefix check skips the other species
+        if not line.startswith(prefix):
+            continue
+        out.write(line)
+        kept += 1
+        if locus_map is not None:
+            # gene_info columns: tax_id, GeneID, Symbol, LocusTag, ...
+            fields = line.split(b"\t", 4)
+            if fields[3] != b"-":
+                locus_map.write(fields[3] + b"\t" + fields[1] + b"\n")
+
+    if locus_map is not None:
+        locus_map.close()
+
+print(f"✅ Kept {kept} rows of taxon {args.taxid} from {args.source}")
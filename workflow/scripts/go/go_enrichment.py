@@ -3,47 +3,117 @@ from goatools.obo_parser import GODag
 from goatools.goea.go_enrichment_ns import GOEnrichmentStudy
 from goatools.associations import read_ncbi_gene2go
 import argparse
+import hashlib
+import multiprocessing
+import os
+import pickle
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--gene2go", required=True)
-parser.add_argument("--target", required=True)
+study = parser.add_mutually_exclusive_group(required=True)
+study.add_argument("--target", help="One study set: a file of GeneIDs")
+study.add_argument("--study_sets", help="Batch mode: TSV with 'set' and 'GeneID' columns, one row per gene of each study set")
 parser.add_argument("--background", required=True)
 parser.add_argument("--obo", required=True)
 parser.add_argument("--out", required=True)
+parser.add_argument("--cache_dir", help="Directory of the parsed gene2go association cache, keyed on the file hash")
+parser.add_argument("--threads", type=int, default=1, help="Processes running the study sets of the batch mode")
 args = parser.parse_args()
 
-# Read inputs
-gene2go = read_ncbi_gene2go(args.gene2go, taxids=[7740])
-go_dag = GODag(args.obo)
+ALPHA = 0.05
+COLUMNS = ["GO", "NS", "name", "p_fdr_bh", "ratio_in_study", "ratio_in_pop", "enrichment"]
 
-with open(args.background) as f:
-    background_genes = [int(line.strip()) for line in f if line.strip().isdigit()]
+# -----------------------------
+# Cached associations
+# -----------------------------
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
 
-with open(args.target) as f:
-    target_genes = [int(line.strip()) for line in f if line.strip().isdigit()]
+def load_associations(gene2go_path, cache_dir=None):
+    """7740 gene2go associations (GeneID -> set of GO IDs), from the cache when the file is unchanged."""
+    cache = None
+    if cache_dir:
+        cache = os.path.join(cache_dir, f"gene2go_{file_hash(gene2go_path)[:16]}.pkl")
+        if os.path.exists(cache):
+            with open(cache, "rb") as f:
+                print(f"Loading GO associations from {cache}")
+                return pickle.load(f)
 
+    gene2go = read_ncbi_gene2go(gene2go_path, taxids=[7740])
+
+    if cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{cache}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            pickle.dump(gene2go, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache)
+    return gene2go
+
+# -----------------------------
 # Enrichment
-goeaobj = GOEnrichmentStudy(
-    background_genes, gene2go, go_dag,
-    propagate_counts=True,
-    alpha=0.05,
-    methods=['fdr_bh']
-)
-
-results = goeaobj.run_study(target_genes)
-
-# Save results
-df = pd.DataFrame([
-    {
-        "GO": r.GO,
-        "NS": r.NS,
-        "name": r.name,
-        "p_fdr_bh": r.p_fdr_bh,
-        "ratio_in_study": f"{r.study_count}/{r.study_n}",
-        "ratio_in_pop": f"{r.pop_count}/{r.pop_n}",
-        "enrichment": r.enrichment,
-    }
-    for r in results if r.p_fdr_bh < 0.05
-])
-df.sort_values("p_fdr_bh", inplace=True)
-df.to_csv(args.out, sep="\t", index=False)
+# -----------------------------
+def read_ids(path):
+    with open(path) as f:
+        return [int(line.strip()) for line in f if line.strip().isdigit()]
+
+def result_rows(results):
+    return [
+        {
+            "GO": r.GO,
+            "NS": r.NS,
+            "name": r.name,
+            "p_fdr_bh": r.p_fdr_bh,
+            "ratio_in_study": f"{r.study_count}/{r.study_n}",
+            "ratio_in_pop": f"{r.pop_count}/{r.pop_n}",
+            "enrichment": r.enrichment,
+        }
+        for r in results if r.p_fdr_bh < ALPHA
+    ]
+
+# Set before the pool forks, so workers share the propagated associations
+goeaobj = None
+
+def run_set(item):
+    set_id, genes = item
+    rows = result_rows(goeaobj.run_study(genes, prt=None))
+    for row in rows:
+        row["set"] = set_id
+    return rows
+
+if __name__ == "__main__":
+    # The DAG links terms both ways, so it is re-parsed (a few seconds) rather than pickled
+    go_dag = GODag(args.obo)
+    gene2go = load_associations(args.gene2go, args.cache_dir)
+    background_genes = read_ids(args.background)
+
+    goeaobj = GOEnrichmentStudy(
+        background_genes, gene2go, go_dag,
+        propagate_counts=True,
+        alpha=ALPHA,
+        methods=['fdr_bh']
+    )
+
+    if args.target:
+        df = pd.DataFrame(result_rows(goeaobj.run_study(read_ids(args.target))), columns=COLUMNS)
+    else:
+        sets = pd.read_csv(args.study_sets, sep="\t", dtype={"set": str})
+        sets = sets[pd.to_numeric(sets["GeneID"], errors="coerce").notna()]
+        items = [(set_id, group["GeneID"].astype(int).tolist())
+                 for set_id, group in sets.groupby("set", sort=False)]
+        print(f"Running {len(items)} study sets on {args.threads} processes")
+
+        if args.threads > 1 and len(items) > 1:
+            with multiprocessing.get_context("fork").Pool(min(args.threads, len(items))) as pool:
+                rows = [row for set_rows in pool.map(run_set, items) for row in set_rows]
+        else:
+            rows = [row for item in items for row in run_set(item)]
+        df = pd.DataFrame(rows, columns=["set"] + COLUMNS)
+
+    # Save results
+    sort_by = ["set", "p_fdr_bh"] if "set" in df.columns else "p_fdr_bh"
+    df.sort_values(sort_by, inplace=True)
+    df.to_csv(args.out, sep="\t", index=False)
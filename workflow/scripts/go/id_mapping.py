@@ -0,0 +1,41 @@
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.id_mapping import ID_COLUMNS, build_index, load_index, convert
+
+# -----------------------------
+# ARGPARSE
+# -----------------------------
+parser = argparse.ArgumentParser(description="Build the gene ID index and convert gene lists with it")
+commands = parser.add_subparsers(dest="command", required=True)
+
+build = commands.add_parser("build", help="Build the gene_id <-> locus_tag <-> GeneID index")
+build.add_argument("--gff_store", required=True, help="Parsed GFF store (.parquet)")
+build.add_argument("--gene_info", required=True, help="NCBI gene_info filtered to the species, with its header")
+build.add_argument("--output", required=True, help="Output index (.parquet)")
+
+conv = commands.add_parser("convert", help="Convert a gene list, one identifier per line")
+conv.add_argument("--index", required=True, help="Gene ID index (.parquet)")
+conv.add_argument("--input", required=True, help="Gene list (header or unknown lines are dropped)")
+conv.add_argument("--output", required=True, help="Converted list")
+conv.add_argument("--from", dest="source", choices=["auto"] + ID_COLUMNS, default="auto", help="Identifier type of the input")
+conv.add_argument("--to", dest="target", choices=ID_COLUMNS, default="GeneID", help="Identifier type of the output")
+args = parser.parse_args()
+
+# -----------------------------
+# RUN
+# -----------------------------
+if args.command == "build":
+    index = build_index(args.gff_store, args.gene_info)
+    index.to_parquet(args.output, index=False)
+    print(f"✅ Indexed {len(index)} genes, {index['GeneID'].notna().sum()} with a GeneID")
+else:
+    index = load_index(args.index)
+    with open(args.input) as f:
+        ids = [line.strip() for line in f if line.strip()]
+    converted, source = convert(index, ids, args.source, args.target)
+    with open(args.output, "w") as out:
+        out.writelines(f"{value}\n" for value in converted)
+    print(f"✅ Converted {len(converted)} of {len(ids)} identifiers ({source} -> {args.target})")
@@ -1,39 +1,32 @@
+import sys
+from pathlib import Path
+import numpy as np
 import pandas as pd
 import argparse
 
-def classify_genotype(gt):
-    if gt in ["./.", ".", ""]:
-        return "missing"
-    alleles = gt.replace("|", "/").split("/")
-    return "heterozygous" if alleles[0] != alleles[1] else "homozygous"
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.genotype_store import load_store
+from common.heterozygosity import heterozygosity_by_sex
 
-def analyze(file, start, end, pos_list, output_prefix):
-    df = pd.read_csv(file, sep="\t")
-
-    # Optional filtering by region
-    if start is not None and end is not None:
-        df = df[(df["POS"] >= start) & (df["POS"] <= end)]
+def analyze(store_prefix, start, end, pos_list, output_prefix):
+    # Optional filtering by region (only the window is read from the store)
+    region = f"{start}-{end}" if start is not None and end is not None else None
+    store = load_store(store_prefix, region=region)
+    keep = np.ones(len(store.pos), dtype=bool)
 
     # Optional filtering by SNP list
     if pos_list is not None:
-        snp_positions = pd.read_csv(pos_list, header=None)[0].tolist()
-        df = df[df["POS"].isin(snp_positions)]
-
-    # Only use known samples
-    female_cols = [col for col in df.columns if (col.startswith("F") or col.startswith("RF")) and not col.startswith("RU")]
-    male_cols = [col for col in df.columns if (col.startswith("M") or col.startswith("RM")) and not col.startswith("RU")]
+        snp_positions = pd.read_csv(pos_list, header=None)[0].to_numpy()
+        keep &= np.isin(store.pos, snp_positions)
 
-    female_class = df[female_cols].applymap(classify_genotype)
-    male_class = df[male_cols].applymap(classify_genotype)
+    snp_index = np.flatnonzero(keep)
 
-    female_summary = female_class.apply(pd.Series.value_counts, axis=1).fillna(0)
-    male_summary = male_class.apply(pd.Series.value_counts, axis=1).fillna(0)
+    # Only use known samples
+    counts = heterozygosity_by_sex(store, snp_index)
 
-    result = df[["CHROM", "POS"]].copy()
-    result["female_heterozygous"] = female_summary.get("heterozygous", 0)
-    result["female_homozygous"] = female_summary.get("homozygous", 0)
-    result["male_heterozygous"] = male_summary.get("heterozygous", 0)
-    result["male_homozygous"] = male_summary.get("homozygous", 0)
+    result = pd.DataFrame({"CHROM": store.chrom, "POS": store.pos[snp_index]})
+    for col in ["female_heterozygous", "female_homozygous", "male_heterozygous", "male_homozygous"]:
+        result[col] = counts[col].to_numpy()
 
     result.to_csv(f"{output_prefix}.tsv", sep="\t", index=False)
 
@@ -64,11 +57,11 @@ def analyze(file, start, end, pos_list, output_prefix):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--input", required=True)
+    parser.add_argument("--store", required=True, help="Genotype store prefix (.gt.npy/.pos.npy/.ref.npy/.alt.npy/.meta.npz)")
     parser.add_argument("--start", type=int, default=None)
     parser.add_argument("--end", type=int, default=None)
     parser.add_argument("--pos-list", default=None)
     parser.add_argument("--output-prefix", required=True)
     args = parser.parse_args()
 
-    analyze(args.input, args.start, args.end, args.pos_list, args.output_prefix)
+    analyze(args.store, args.start, args.end, args.pos_list, args.output_prefix)
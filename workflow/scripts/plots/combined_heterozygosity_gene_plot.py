@@ -1,12 +1,18 @@
 import argparse
+import sys
+from pathlib import Path
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import numpy as np
 import matplotlib.patches as mpatches
 import matplotlib.gridspec as gridspec
 from matplotlib.lines import Line2D
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.genotype_store import load_store
+from common.gff import load_gff, features_in_region
+from common.heterozygosity import heterozygosity_by_sex
+
 # -----------------------------
 # COLORBLIND-FRIENDLY SETTINGS
 # -----------------------------
@@ -22,69 +28,38 @@ arrow_color = cb_palette[0]
 # ARGPARSE
 # -----------------------------
 parser = argparse.ArgumentParser(description="Combine heterozygosity plots with gene annotations")
-parser.add_argument("--vcf_tab", required=True, help="VCF tabular file with genotypes")
-parser.add_argument("--gff", required=True, help="GFF3 annotation file")
+parser.add_argument("--store", required=True, help="Genotype store prefix (.gt.npy/.pos.npy/.ref.npy/.alt.npy/.meta.npz)")
+parser.add_argument("--gff_store", required=True, help="Parsed GFF store (.parquet)")
 parser.add_argument("--seqid", required=True, help="Chromosome/scaffold name")
 parser.add_argument("--region_start", type=int, required=True, help="Start of region")
 parser.add_argument("--region_end", type=int, required=True, help="End of region")
+parser.add_argument("--region", default=None, help="Only load SNPs in CHROM:START-END (default: whole chromosome)")
 parser.add_argument("--top_snps", required=False, help="TSV file with top SNPs to highlight")
 parser.add_argument("--out_png", required=True)
 parser.add_argument("--out_pdf", required=True)
 parser.add_argument("--out_svg", required=True)
 args = parser.parse_args()
 
-# -----------------------------
-# LOAD DATA
-# -----------------------------
-df = pd.read_csv(args.vcf_tab, sep="\t")
-col_names = ["seqid", "source", "type", "start", "end", "score", "strand", "phase", "attributes"]
-gff = pd.read_csv(args.gff, sep="\t", comment="#", names=col_names)
+# Smoothing window (in SNPs); region loads keep this many flanking SNPs
+window_size = 50
 
 # -----------------------------
-# FUNCTIONS
+# LOAD DATA
 # -----------------------------
-def compute_heterozygosity(gt):
-    if not isinstance(gt, str) or gt in ("./.", ".|."):
-        return np.nan
-    alleles = gt.replace("|", "/").split("/")
-    if len(alleles) != 2:
-        return np.nan
-    return 1 if alleles[0] != alleles[1] else 0
-
-def infer_sex(name):
-    name = name.upper()
-    if name.startswith("F") or name.startswith("RF"):
-        return "F"
-    elif name.startswith("M") or name.startswith("RM"):
-        return "M"
-    else:
-        return "U"
-
-def extract_gene_id(attr):
-    for field in attr.split(";"):
-        if "Name=" in field:
-            return field.split("Name=")[-1]
-        elif "gene=" in field:
-            return field.split("gene=")[-1]
-        elif "ID=" in field:
-            return field.split("ID=")[-1]
-    return "unknown"
+store = load_store(args.store, region=args.region, pad=window_size - 1)
+genes = load_gff(args.gff_store, types=["gene"])
 
 # -----------------------------
 # PROCESSING
 # -----------------------------
-gt_columns = [col for col in df.columns if col.endswith(".GT")]
-sex_map = {col: infer_sex(col) for col in gt_columns}
-female_inds = [col for col in gt_columns if sex_map[col] == "F"]
-male_inds = [col for col in gt_columns if sex_map[col] == "M"]
-positions = df["POS"]
+positions = pd.Series(store.pos)
 
 # Raw heterozygosity
-female_het = df[female_inds].applymap(compute_heterozygosity).mean(axis=1)
-male_het = df[male_inds].applymap(compute_heterozygosity).mean(axis=1)
+het = heterozygosity_by_sex(store)
+female_het = het["female_het"]
+male_het = het["male_het"]
 
 # Smoothed heterozygosity
-window_size = 50
 female_het_smooth = female_het.rolling(window=window_size, min_periods=1).mean()
 male_het_smooth = male_het.rolling(window=window_size, min_periods=1).mean()
 diff_het = female_het_smooth - male_het_smooth
@@ -92,13 +67,8 @@ diff_het = female_het_smooth - male_het_smooth
 # -----------------------------
 # GENE ANNOTATIONS
 # -----------------------------
-region = gff[
-    (gff["seqid"] == args.seqid) &
-    (gff["type"] == "gene") &
-    (gff["start"] <= args.region_end) &
-    (gff["end"] >= args.region_start)
-].copy()
-region["gene_id"] = region["attributes"].apply(extract_gene_id)
+region = features_in_region(genes, args.seqid, args.region_start, args.region_end).copy()
+region["gene_id"] = region["label"]
 
 label_dict = {
     "gene-BLAG_LOCUS17194": "HAO1",
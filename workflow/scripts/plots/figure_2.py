@@ -1,21 +1,28 @@
 import argparse
+import sys
+from pathlib import Path
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import numpy as np
 import matplotlib.patches as mpatches
 import matplotlib.gridspec as gridspec
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.genotype_store import load_store
+from common.gff import load_gff, features_in_region
+from common.heterozygosity import heterozygosity_by_sex
+
 # -----------------------------
 # ARGPARSE
 # -----------------------------
 parser = argparse.ArgumentParser(description="Combine heterozygosity plots and gene annotation into one figure")
 
-parser.add_argument("--vcf_tab", required=True, help="VCF tabular file with genotypes")
-parser.add_argument("--gff", required=True, help="Path to GFF3 annotation file")
+parser.add_argument("--store", required=True, help="Genotype store prefix (.gt.npy/.pos.npy/.ref.npy/.alt.npy/.meta.npz)")
+parser.add_argument("--gff_store", required=True, help="Parsed GFF store (.parquet)")
 parser.add_argument("--seqid", required=True, help="Chromosome/scaffold name")
 parser.add_argument("--region_start", type=int, required=True, help="Start coordinate of region")
 parser.add_argument("--region_end", type=int, required=True, help="End coordinate of region")
+parser.add_argument("--region", default=None, help="Only load SNPs in CHROM:START-END (default: whole chromosome)")
 parser.add_argument("--out_png", required=True, help="Output PNG path")
 parser.add_argument("--out_pdf", required=True, help="Output PDF path")
 parser.add_argument("--out_svg", required=True, help="Output SVG path")
@@ -33,33 +40,20 @@ diff_color = palette[2]
 region_color = palette[6]
 arrow_color = palette[0]
 
+# Smoothing window (in SNPs); region loads keep this many flanking SNPs
+window_size = 50
+
 # -----------------------------
 # LOAD GENOTYPE DATA
 # -----------------------------
-df = pd.read_csv(args.vcf_tab, sep="\t")
-positions = df["POS"]
-
-def compute_heterozygosity(gt):
-    if not isinstance(gt, str) or gt in ("./.", ".|."):
-        return np.nan
-    alleles = gt.replace("|", "/").split("/")
-    return 1 if len(alleles) == 2 and alleles[0] != alleles[1] else 0
+store = load_store(args.store, region=args.region, pad=window_size - 1)
+positions = pd.Series(store.pos)
 
-def infer_sex(name):
-    name = name.upper()
-    return "F" if name.startswith("F") or name.startswith("RF") else \
-           "M" if name.startswith("M") or name.startswith("RM") else "U"
-
-gt_columns = [col for col in df.columns if col.endswith(".GT")]
-sex_map = {col: infer_sex(col) for col in gt_columns}
-female_inds = [col for col in gt_columns if sex_map[col] == "F"]
-male_inds = [col for col in gt_columns if sex_map[col] == "M"]
-
-female_het = df[female_inds].applymap(compute_heterozygosity).mean(axis=1)
-male_het = df[male_inds].applymap(compute_heterozygosity).mean(axis=1)
+het = heterozygosity_by_sex(store)
+female_het = het["female_het"]
+male_het = het["male_het"]
 
 # Smoothed values
-window_size = 50
 female_het_smooth = female_het.rolling(window=window_size, min_periods=1).mean()
 male_het_smooth = male_het.rolling(window=window_size, min_periods=1).mean()
 diff_het = female_het_smooth - male_het_smooth
@@ -67,27 +61,9 @@ diff_het = female_het_smooth - male_het_smooth
 # -----------------------------
 # LOAD GFF & EXTRACT GENES
 # -----------------------------
-col_names = ["seqid", "source", "type", "start", "end", "score", "strand", "phase", "attributes"]
-gff = pd.read_csv(args.gff, sep="\t", comment="#", names=col_names)
-
-region = gff[
-    (gff["seqid"] == args.seqid) &
-    (gff["type"] == "gene") &
-    (gff["start"] <= args.region_end) &
-    (gff["end"] >= args.region_start)
-].copy()
-
-def extract_gene_id(attr):
-    for field in attr.split(";"):
-        if "Name=" in field:
-            return field.split("Name=")[-1]
-        elif "gene=" in field:
-            return field.split("gene=")[-1]
-        elif "ID=" in field:
-            return field.split("ID=")[-1]
-    return "unknown"
-
-region["gene_id"] = region["attributes"].apply(extract_gene_id)
+genes = load_gff(args.gff_store, types=["gene"])
+region = features_in_region(genes, args.seqid, args.region_start, args.region_end).copy()
+region["gene_id"] = region["label"]
 
 # Manual label mapping (customize as needed)
 label_dict = {
@@ -1,9 +1,13 @@
 import argparse
-import pandas as pd
+import sys
+from pathlib import Path
 import matplotlib.pyplot as plt
 import seaborn as sns
 import matplotlib.patches as mpatches
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.gff import load_gff, features_in_region
+
 # -----------------------------
 # COLORBLIND-FRIENDLY STYLE
 # -----------------------------
@@ -16,7 +20,7 @@ arrow_color = palette[0]  # Index 0: blue
 # -----------------------------
 parser = argparse.ArgumentParser(description="Plot genes in a region from GFF3")
 
-parser.add_argument("--gff", required=True, help="Path to GFF3 annotation file")
+parser.add_argument("--gff_store", required=True, help="Parsed GFF store (.parquet)")
 parser.add_argument("--seqid", required=True, help="Chromosome/scaffold name (e.g., 'chr4')")
 parser.add_argument("--start", type=int, required=True, help="Start coordinate of region")
 parser.add_argument("--end", type=int, required=True, help="End coordinate of region")
@@ -29,34 +33,14 @@ args = parser.parse_args()
 # -----------------------------
 # LOAD GFF
 # -----------------------------
-col_names = ["seqid", "source", "type", "start", "end", "score", "strand", "phase", "attributes"]
-gff = pd.read_csv(args.gff, sep="\t", comment="#", names=col_names)
-
-# -----------------------------
-# FILTER GENE FEATURES IN REGION
-# -----------------------------
 valid_types = ["gene"]
-region = gff[
-    (gff["seqid"] == args.seqid) &
-    (gff["type"].isin(valid_types)) &
-    (gff["start"] <= args.end) &
-    (gff["end"] >= args.start)
-].copy()
+gff = load_gff(args.gff_store, types=valid_types)
 
 # -----------------------------
-# EXTRACT GENE IDS
+# GENE FEATURES IN REGION
 # -----------------------------
-def extract_gene_id(attr):
-    for field in attr.split(";"):
-        if "Name=" in field:
-            return field.split("Name=")[-1]
-        elif "gene=" in field:
-            return field.split("gene=")[-1]
-        elif "ID=" in field:
-            return field.split("ID=")[-1]
-    return "unknown"
-
-region["gene_id"] = region["attributes"].apply(extract_gene_id)
+region = features_in_region(gff, args.seqid, args.start, args.end).copy()
+region["gene_id"] = region["label"]
 
 # -----------------------------
 # MANUAL GENE LABELS
@@ -1,8 +1,13 @@
 import argparse
+import sys
+from pathlib import Path
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.genotype_store import load_store
+from common.heterozygosity import heterozygosity_by_sex
 
 # -----------------------------
 # COLORBLIND-FRIENDLY SETTINGS
@@ -14,53 +19,31 @@ sns.set(style="whitegrid", context="talk", palette="colorblind")
 # -----------------------------
 parser = argparse.ArgumentParser(description="Plot smoothed heterozygosity by sex")
 
-parser.add_argument("--input", required=True, help="Input .tab file with genotypes")
+parser.add_argument("--store", required=True, help="Genotype store prefix (.gt.npy/.pos.npy/.ref.npy/.alt.npy/.meta.npz)")
 parser.add_argument("--out_png", required=True, help="Output PNG path")
 parser.add_argument("--out_pdf", required=True, help="Output PDF path")
 parser.add_argument("--out_svg", required=True, help="Output SVG path")
 parser.add_argument("--region_start", type=int, default=6142346, help="Start of region of interest")
 parser.add_argument("--region_end", type=int, default=6164195, help="End of region of interest")
+parser.add_argument("--region", default=None, help="Only load SNPs in CHROM:START-END (default: whole chromosome)")
 
 args = parser.parse_args()
 
+# Smoothing window (in SNPs); region loads keep this many flanking SNPs
+window_size = 50
+
 # -----------------------------
 # LOAD DATA
 # -----------------------------
-df = pd.read_csv(args.input, sep="\t")
-
-# Function to compute heterozygosity
-def compute_heterozygosity(gt):
-    if not isinstance(gt, str) or gt in ("./.", ".|."):
-        return np.nan
-    alleles = gt.replace("|", "/").split("/")
-    if len(alleles) != 2:
-        return np.nan
-    return 1 if alleles[0] != alleles[1] else 0
-
-# Detect genotype columns
-gt_columns = [col for col in df.columns if col.endswith(".GT")]
-
-# Infer sex from sample names
-def infer_sex(name):
-    name = name.upper()
-    if name.startswith("F") or name.startswith("RF"):
-        return "F"
-    elif name.startswith("M") or name.startswith("RM"):
-        return "M"
-    else:
-        return "U"
-
-sex_map = {col: infer_sex(col) for col in gt_columns}
-female_inds = [col for col in gt_columns if sex_map[col] == "F"]
-male_inds = [col for col in gt_columns if sex_map[col] == "M"]
+store = load_store(args.store, region=args.region, pad=window_size - 1)
 
 # Compute heterozygosity
-positions = df["POS"]
-female_het = df[female_inds].applymap(compute_heterozygosity).mean(axis=1)
-male_het = df[male_inds].applymap(compute_heterozygosity).mean(axis=1)
+positions = pd.Series(store.pos)
+het = heterozygosity_by_sex(store)
+female_het = het["female_het"]
+male_het = het["male_het"]
 
 # Smooth
-window_size = 50
 female_het_smooth = female_het.rolling(window=window_size, min_periods=1).mean()
 male_het_smooth = male_het.rolling(window=window_size, min_periods=1).mean()
 diff_het = female_het_smooth - male_het_smooth
@@ -1,8 +1,13 @@
 import argparse
+import sys
+from pathlib import Path
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.genotype_store import load_store
+from common.heterozygosity import heterozygosity_by_sex
 
 # -----------------------------
 # COLORBLIND-FRIENDLY SETTINGS
@@ -13,50 +18,28 @@ sns.set(style="whitegrid", context="talk", palette="colorblind")
 # ARGPARSE
 # -----------------------------
 parser = argparse.ArgumentParser(description="Plot raw heterozygosity by sex (no smoothing)")
-parser.add_argument("--input", required=True, help="Input .tab file with genotypes")
+parser.add_argument("--store", required=True, help="Genotype store prefix (.gt.npy/.pos.npy/.ref.npy/.alt.npy/.meta.npz)")
 parser.add_argument("--out_png", required=True, help="Output PNG path")
 parser.add_argument("--out_pdf", required=True, help="Output PDF path")
 parser.add_argument("--out_svg", required=True, help="Output SVG path")
 parser.add_argument("--region_start", type=int, default=6142346, help="Start of region of interest")
 parser.add_argument("--region_end", type=int, default=6164195, help="End of region of interest")
+parser.add_argument("--region", default=None, help="Only load SNPs in CHROM:START-END (default: whole chromosome)")
 args = parser.parse_args()
 
 # -----------------------------
 # LOAD DATA
 # -----------------------------
-df = pd.read_csv(args.input, sep="\t")
-
-# -----------------------------
-# FUNCTIONS
-# -----------------------------
-def compute_heterozygosity(gt):
-    if not isinstance(gt, str) or gt in ("./.", ".|."):
-        return np.nan
-    alleles = gt.replace("|", "/").split("/")
-    if len(alleles) != 2:
-        return np.nan
-    return 1 if alleles[0] != alleles[1] else 0
-
-def infer_sex(name):
-    name = name.upper()
-    if name.startswith("F") or name.startswith("RF"):
-        return "F"
-    elif name.startswith("M") or name.startswith("RM"):
-        return "M"
-    else:
-        return "U"
+store = load_store(args.store, region=args.region)
 
 # -----------------------------
 # PROCESSING
 # -----------------------------
-gt_columns = [col for col in df.columns if col.endswith(".GT")]
-sex_map = {col: infer_sex(col) for col in gt_columns}
-female_inds = [col for col in gt_columns if sex_map[col] == "F"]
-male_inds = [col for col in gt_columns if sex_map[col] == "M"]
-positions = df["POS"]
+positions = pd.Series(store.pos)
 
-female_het = df[female_inds].applymap(compute_heterozygosity).mean(axis=1)
-male_het = df[male_inds].applymap(compute_heterozygosity).mean(axis=1)
+het = heterozygosity_by_sex(store)
+female_het = het["female_het"]
+male_het = het["male_het"]
 
 # -----------------------------
 # PLOTTING
@@ -1,11 +1,16 @@
 import argparse
+import sys
+from pathlib import Path
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-from scipy.stats import fisher_exact
 import json
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.association import carrier_counts, fisher_exact_2x2
+from common.genotype_store import load_store, genotype_strings
+
 # -----------------------------
 # STYLE: Colorblind Palette
 # -----------------------------
@@ -16,75 +21,38 @@ colors = sns.color_palette("colorblind", n_colors=20)
 # ARGPARSE
 # -----------------------------
 parser = argparse.ArgumentParser(description="Genome-wide Manhattan plot of SNP sex-association p-values")
-parser.add_argument("--input", required=True, help="Input .tab file with genotypes")
+parser.add_argument("--stores", nargs="+", required=True, help="Genotype store prefixes, one per chromosome")
 parser.add_argument("--out_png", required=True, help="Output PNG path")
 parser.add_argument("--out_pdf", required=True, help="Output PDF path")
 parser.add_argument("--out_svg", required=True, help="Output SVG path")
 parser.add_argument("--out_top_snps", required=True, help="Output file for top 5 SNPs information")
 args = parser.parse_args()
 
-# -----------------------------
-# LOAD DATA
-# -----------------------------
-df = pd.read_csv(args.input, sep="\t")
-gt_columns = [col for col in df.columns if col.endswith(".GT")]
-
-def infer_sex(name):
-    name = name.upper()
-    if name.startswith("F") or name.startswith("RF"):
-        return "F"
-    elif name.startswith("M") or name.startswith("RM"):
-        return "M"
-    else:
-        return "U"
-
-sex_map = {col: infer_sex(col) for col in gt_columns}
-female_inds = [col for col in gt_columns if sex_map[col] == "F"]
-male_inds = [col for col in gt_columns if sex_map[col] == "M"]
-
-def parse_alleles(geno):
-    if not isinstance(geno, str) or geno in ["./.", ".|.", ".", ""]:
-        return None
-    return geno.replace("|", "/").split("/")
-
-def has_alt(geno, alt):
-    alleles = parse_alleles(geno)
-    return alleles is not None and alt in alleles
-
 # -----------------------------
 # COMPUTE P-VALUES
 # -----------------------------
+# Carrier counts for all SNPs of a chromosome at once, then one batched Fisher
+# test on the [[female_ref, female_alt], [male_ref, male_alt]] tables
+stores = {}
 results = []
 
-for idx, row in df.iterrows():
-    alt = row["ALT"]
-    male_alt = male_ref = female_alt = female_ref = 0
-
-    for col in female_inds:
-        if has_alt(row[col], alt):
-            female_alt += 1
-        elif parse_alleles(row[col]) is not None:
-            female_ref += 1
-
-    for col in male_inds:
-        if has_alt(row[col], alt):
-            male_alt += 1
-        elif parse_alleles(row[col]) is not None:
-            male_ref += 1
-
-    table = [[female_ref, female_alt], [male_ref, male_alt]]
-    if all(sum(row) > 0 for row in table):
-        _, pval = fisher_exact(table)
-    else:
-        pval = np.nan
-
-    results.append({
-        "chr": row["CHROM"],
-        "pos": row["POS"],
-        "pval": pval
-    })
+for prefix in args.stores:
+    store = load_store(prefix)
+    stores[store.chrom] = store
+
+    female_alt, female_ref = carrier_counts(store.gt[store.sex == "F"])
+    male_alt, male_ref = carrier_counts(store.gt[store.sex == "M"])
+    pvals = fisher_exact_2x2(female_ref, female_alt, male_ref, male_alt)
+
+    results.append(pd.DataFrame({
+        "chr": store.chrom,
+        "pos": np.asarray(store.pos),
+        "pval": pvals
+    }))
+
+results = pd.concat(results, ignore_index=True)
 
-res_df = pd.DataFrame(results).dropna()
+res_df = results.dropna()
 res_df["-log10p"] = -np.log10(res_df["pval"])
 
 # -----------------------------
@@ -113,13 +81,13 @@ top_snps = res_df.sort_values("-log10p", ascending=False).head(5)
 top_snp_info = []
 
 for _, snp in top_snps.iterrows():
-    orig_row = df[(df["CHROM"] == snp["chr"]) & (df["POS"] == snp["pos"])].iloc[0]
-    genotypes = {col: orig_row[col] for col in gt_columns}
+    store = stores[snp["chr"]]
+    genotypes = genotype_strings(store, np.searchsorted(store.pos, snp["pos"]))
     top_snp_info.append({
         "chromosome": snp["chr"],
-        "position": snp["pos"],
-        "p_value": snp["pval"],
-        "-log10_p_value": snp["-log10p"],
+        "position": int(snp["pos"]),
+        "p_value": float(snp["pval"]),
+        "-log10_p_value": float(snp["-log10p"]),
         "genotypes": genotypes
     })
 
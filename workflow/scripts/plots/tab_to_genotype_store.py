@@ -0,0 +1,20 @@
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.genotype_store import tab_to_store
+
+# -----------------------------
+# ARGPARSE
+# -----------------------------
+parser = argparse.ArgumentParser(description="Convert a VariantsToTable file into a binary genotype store")
+parser.add_argument("--input", required=True, help="Input .tab file with genotypes")
+parser.add_argument("--output_prefix", required=True, help="Prefix of the .gt.npy/.pos.npy/.ref.npy/.alt.npy/.meta.npz store files")
+args = parser.parse_args()
+
+# -----------------------------
+# CONVERT
+# -----------------------------
+tab_to_store(args.input, args.output_prefix)
+print(f"✅ Wrote genotype store {args.output_prefix}")
@@ -0,0 +1,20 @@
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.gff import gff_to_store
+
+# -----------------------------
+# ARGPARSE
+# -----------------------------
+parser = argparse.ArgumentParser(description="Parse a GFF3 annotation once into an indexed Parquet store")
+parser.add_argument("--gff", required=True, help="Input GFF3 file")
+parser.add_argument("--output", required=True, help="Output GFF store (.parquet)")
+args = parser.parse_args()
+
+# -----------------------------
+# CONVERT
+# -----------------------------
+gff_to_store(args.gff, args.output)
+print(f"✅ Wrote GFF store {args.output}")
@@ -1,80 +1,136 @@
 import argparse
+import sys
+from pathlib import Path
+import numpy as np
 import pandas as pd
-from Bio import SeqIO
-from Bio.Seq import Seq
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.gff import load_gff, seqid_slice
+from common.genotype_store import load_store
+from common.fasta import IndexedFasta
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Classify SNP effects manually.")
-    parser.add_argument("--snps", required=True, help="Path to SNPs TSV file with CHROM, POS, REF, ALT columns")
-    parser.add_argument("--gff", required=True, help="Path to GFF file with CDS annotations")
+    snps = parser.add_mutually_exclusive_group(required=True)
+    snps.add_argument("--snps", help="Path to SNPs TSV file with CHROM, POS, REF, ALT columns")
+    snps.add_argument("--store", help="Genotype store prefix: classify every SNP of the store")
+    parser.add_argument("--gff_store", required=True, help="Parsed GFF store (.parquet) with CDS annotations")
     parser.add_argument("--ref", required=True, help="Path to reference genome in FASTA format")
+    parser.add_argument("--fai", help="samtools faidx index of the reference (default: <ref>.fai)")
+    parser.add_argument("--chrom_map", help="Two-column file renaming SNP chromosomes to FASTA IDs (bcftools --rename-chrs format)")
     parser.add_argument("--output", required=True, help="Output TSV file with SNP effects")
     return parser.parse_args()
 
-# Map CHROM values like "chr4" to actual FASTA IDs
+# Map CHROM values like "chr4" to actual FASTA IDs, when no --chrom_map is given
 chromosome_map = {
     "chr4": "OV696689.1"
 }
 
-def classify_snp(chrom, pos, ref_base, alt_base, ref_genome, cds):
-    pos = int(pos)
-    fasta_id = chromosome_map.get(chrom, chrom)
-    if fasta_id not in ref_genome:
-      raise KeyError(f"Chromosome {fasta_id} not found in reference genome.")
-    ref_seq = ref_genome[fasta_id].seq
-
-
-    overlapping = cds[(cds["seqid"] == chrom) & (cds["start"] <= pos) & (cds["end"] >= pos)]
-    if overlapping.empty:
-        return "intergenic"
-
-    row = overlapping.iloc[0]
-    strand = row["strand"]
-    phase = int(row["phase"]) if row["phase"] != '.' else 0
-    cds_start = row["start"]
-
-    rel_pos = pos - cds_start
-    codon_start = pos - ((rel_pos + phase) % 3)
-    codon_seq = ref_seq[codon_start:codon_start + 3]
-
-    if len(codon_seq) != 3:
-        return "partial"
-
-    if strand == "-":
-        codon_seq = codon_seq.reverse_complement()
-        snp_index = 2 - ((pos - codon_start) % 3)
-    else:
-        snp_index = (pos - codon_start) % 3
-
-    ref_codon = str(codon_seq)
-    alt_codon = list(ref_codon)
-    alt_codon[snp_index] = alt_base
-    alt_codon = ''.join(alt_codon)
-
-    aa_ref = str(Seq(ref_codon).translate())
-    aa_alt = str(Seq(alt_codon).translate())
-
-    if aa_ref == aa_alt:
-        return "silent"
-    elif aa_alt == "*":
-        return "nonsense"
-    else:
-        return "missense"
+def read_chrom_map(path):
+    with open(path) as f:
+        return dict(line.split()[:2] for line in f if line.strip())
+
+# Standard genetic code, codons indexed as 16 * b1 + 4 * b2 + b3 with T=0, C=1, A=2, G=3
+CODON_TABLE = np.frombuffer(b"FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG", dtype="S1")
+BASE_CODE = np.full(256, -1, dtype=np.int8)
+for code, base in enumerate(b"TCAG"):
+    BASE_CODE[base] = BASE_CODE[ord(chr(base).lower())] = code
+COMPLEMENT = np.frombuffer(bytes.maketrans(b"ACGTacgtNn", b"TGCAtgcaNn"), dtype=np.uint8)
+
+def translate(codons):
+    """Translate an (n, 3) array of ASCII bases with the codon table; codons with other bases give 'X'."""
+    code = BASE_CODE[codons].astype(np.int16)
+    index = 16 * code[:, 0] + 4 * code[:, 1] + code[:, 2]
+    aa = np.full(len(codons), b"X", dtype="S1")
+    valid = (code >= 0).all(axis=1)
+    aa[valid] = CODON_TABLE[index[valid]]
+    return aa
+
+def first_overlap(cds, pos):
+    """
+    Row of the first CDS (in start order) containing each position, or -1. The
+    positions are swept along the CDS rows from the first one whose running
+    max_end reaches them.
+    """
+    starts = cds["start"].to_numpy()
+    ends = cds["end"].to_numpy()
+    idx = np.searchsorted(cds["max_end"].to_numpy(), pos, side="left")
+    stop = np.searchsorted(starts, pos, side="right")
+    hit = np.full(len(pos), -1, dtype=np.int64)
+    active = idx < stop
+    while active.any():
+        found = active.copy()
+        found[active] = ends[idx[active]] >= pos[active]
+        hit[found] = idx[found]
+        active &= ~found
+        idx[active] += 1
+        active &= idx < stop
+    return hit
+
+def classify_chrom(snps, ref_genome, seqid, cds):
+    """Classify the SNPs of one sequence against its CDS rows (sorted by start, with max_end)."""
+    effect = np.full(len(snps), "intergenic", dtype=object)
+    pos = snps["POS"].to_numpy(dtype=np.int64)
+    hit = first_overlap(cds, pos)
+    coding = np.flatnonzero(hit >= 0)
+    if len(coding) == 0:
+        return effect
+
+    row = hit[coding]
+    pos = pos[coding]
+    start = cds["start"].to_numpy()[row]
+    end = cds["end"].to_numpy()[row]
+    minus = cds["strand"].to_numpy()[row] == "-"
+    phase = pd.to_numeric(cds["phase"].iloc[row], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+
+    # Offset of the SNP in its codon, in reading direction. The phase counts the
+    # bases before the first codon from the 5' end of the CDS: the start on the
+    # plus strand, the end on the minus strand.
+    offset = np.where(minus, end - phase - pos, pos - start - phase) % 3
+    first = np.where(minus, pos + offset - 2, pos - offset)  # lowest 1-based codon position
+    split = (first < start) | (first + 2 > end) | (first < 1) | (first + 2 > ref_genome.length(seqid))
+    effect[coding[split]] = "partial"
+
+    keep = ~split
+    pos, offset, first, minus = pos[keep], offset[keep], first[keep], minus[keep]
+    codons = ref_genome.bases(seqid, first[:, None] + np.arange(3))
+    alt_base = np.frombuffer("".join(snps["ALT"].iloc[coding[keep]].astype(str).str[0].str.upper()).encode(),
+                             dtype=np.uint8).copy()
+    codons[minus] = COMPLEMENT[codons[minus][:, ::-1]]
+    alt_base[minus] = COMPLEMENT[alt_base[minus]]
+    alt_codons = codons.copy()
+    alt_codons[np.arange(len(alt_codons)), offset] = alt_base
+
+    aa_ref = translate(codons)
+    aa_alt = translate(alt_codons)
+    effect[coding[keep]] = np.where(aa_ref == aa_alt, "silent", np.where(aa_alt == b"*", "nonsense", "missense"))
+    return effect
 
 def main():
     args = parse_args()
 
-    snps = pd.read_csv(args.snps, sep="\t", usecols=["CHROM", "POS", "REF", "ALT"])
-    gff = pd.read_csv(args.gff, sep="\t", comment='#', header=None,
-                      names=["seqid", "source", "type", "start", "end", "score", "strand", "phase", "attributes"])
-    cds = gff[gff["type"] == "CDS"]
-
-    ref_genome = SeqIO.to_dict(SeqIO.parse(args.ref, "fasta"))
-
-    snps["effect"] = snps.apply(lambda row: classify_snp(
-        row["CHROM"], row["POS"], row["REF"], row["ALT"], ref_genome, cds), axis=1)
+    if args.store:
+        store = load_store(args.store)
+        snps = pd.DataFrame({"CHROM": store.chrom, "POS": store.pos, "REF": store.ref, "ALT": store.alt})
+    else:
+        snps = pd.read_csv(args.snps, sep="\t", usecols=["CHROM", "POS", "REF", "ALT"])
+    cds = load_gff(args.gff_store, types=["CDS"], columns=["strand", "phase"])
+
+    chrom_map = read_chrom_map(args.chrom_map) if args.chrom_map else chromosome_map
+    seqids = snps["CHROM"].map(lambda chrom: chrom_map.get(chrom, chrom))
+    ref_genome = IndexedFasta(args.ref, args.fai)
+    missing = set(seqids) - set(ref_genome.index)
+    if missing:
+        raise KeyError(f"Chromosome {', '.join(sorted(missing))} not found in reference genome.")
+
+    snps["effect"] = "intergenic"
+    with ref_genome:
+        for seqid, rows in snps.groupby(seqids).indices.items():
+            chrom_cds = cds.iloc[seqid_slice(cds, seqid)]
+            snps.loc[snps.index[rows], "effect"] = classify_chrom(snps.iloc[rows], ref_genome, seqid, chrom_cds)
 
     snps.to_csv(args.output, sep="\t", index=False)
+    print(snps["effect"].value_counts().to_string())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
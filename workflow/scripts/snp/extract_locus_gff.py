@@ -1,31 +1,39 @@
 import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.gff import load_gff, gff_header, select_loci, write_gff
+
+def read_loci(path):
+    """Loci listed one per line (first column of a TSV), skipping blanks and comments."""
+    with open(path) as f:
+        return [line.split("\t")[0].strip() for line in f if line.strip() and not line.startswith("#")]
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--input", required=True)
+    parser.add_argument("--gff_store", required=True, help="Parsed GFF store (.parquet)")
     parser.add_argument("--output", required=True)
-    parser.add_argument("--loci", nargs="+", required=True)
+    parser.add_argument("--loci", nargs="+", default=[], help="Locus tags or gene IDs to keep")
+    parser.add_argument("--loci_file", help="File with one locus tag or gene ID per line")
     args = parser.parse_args()
 
-    loci_set = set(args.loci)
-
-    kept_lines = []
-    with open(args.input) as fin:
-        for line in fin:
-            if line.startswith("#"):
-                kept_lines.append(line)
-                continue
-            fields = line.strip().split("\t")
-            if len(fields) < 9:
-                continue
-            attr = fields[8]
-            if any(locus in attr for locus in loci_set):
-                kept_lines.append(line)
+    loci = set(args.loci)
+    if args.loci_file:
+        loci.update(read_loci(args.loci_file))
+    if not loci:
+        parser.error("give --loci and/or --loci_file")
 
-    with open(args.output, "w") as fout:
-        fout.writelines(kept_lines)
+    # Genes matched by locus_tag or ID, plus their mRNAs, exons and CDS through Parent
+    gff = load_gff(args.gff_store, columns=["line", "source", "type", "score", "strand", "phase",
+                                            "attributes", "ID", "locus_tag", "Parent"])
+    kept = gff[select_loci(gff, loci)]
+    write_gff(args.output, kept, header=gff_header(args.gff_store))
 
-    print(f"Wrote {len(kept_lines)} lines for loci: {', '.join(args.loci)}")
+    found = loci & (set(kept["locus_tag"].dropna()) | set(kept["ID"].dropna()))
+    print(f"Wrote {len(kept)} features for {len(found)} of {len(loci)} loci")
+    if len(found) < len(loci):
+        print(f"Not found: {', '.join(sorted(loci - found)[:20])}")
 
 if __name__ == "__main__":
     main()
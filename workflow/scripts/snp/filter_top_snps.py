@@ -1,11 +1,17 @@
 import argparse
+import sys
+from pathlib import Path
+import numpy as np
 import pandas as pd
 import json
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.genotype_store import load_store
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Extract top SNPs from master list.")
     parser.add_argument("--json", required=True, help="Path to JSON with top SNPs")
-    parser.add_argument("--snps", required=True, help="Path to full SNP TSV (must have CHROM, POS, REF, ALT)")
+    parser.add_argument("--store", required=True, help="Genotype store prefix of the SNP master list")
     parser.add_argument("--output", required=True, help="Path to output TSV of filtered top SNPs")
     return parser.parse_args()
 
@@ -17,11 +23,18 @@ def main():
         top_snps = json.load(f)
     top_positions = {(snp["chromosome"], snp["position"]) for snp in top_snps}
 
-    # Load full SNP table
-    df = pd.read_csv(args.snps, sep="\t")
+    # Load SNP positions and alleles (genotypes are not needed here)
+    store = load_store(args.store)
+    wanted = [pos for chrom, pos in top_positions if chrom == store.chrom]
+    snp_index = np.flatnonzero(np.isin(store.pos, wanted))
 
     # Filter
-    filtered = df[df.apply(lambda row: (row["CHROM"], row["POS"]) in top_positions, axis=1)]
+    filtered = pd.DataFrame({
+        "CHROM": store.chrom,
+        "POS": store.pos[snp_index],
+        "REF": store.ref[snp_index],
+        "ALT": store.alt[snp_index]
+    })
 
     # Output only columns required for annotation
     columns = ["CHROM", "POS", "REF", "ALT"]
@@ -1,45 +1,132 @@
 #!/usr/bin/env python3
 
 import argparse
+import os
+from bisect import bisect_right
+import re
+import shutil
+from multiprocessing import Pool
 from pathlib import Path
 
-def main():
-    parser = argparse.ArgumentParser(description="Fix GFF for SnpEff.")
-    parser.add_argument("--input", dest="input_gff", type=Path, required=True, help="Input GFF file")
-    parser.add_argument("--output", dest="output_gff", type=Path, required=True, help="Output GFF file")
-    args = parser.parse_args()
-
-    gene_to_rna = {}
+REMAPPED_TYPES = {"CDS", "exon", "five_prime_UTR", "three_prime_UTR"}
+MRNA_ID = re.compile(rb"(?:^|;)ID=([^;\n]*)")
+MRNA_PARENT = re.compile(rb"(?:^|;)Parent=([^;\n]*)")
 
-    with args.input_gff.open() as infile, args.output_gff.open("w") as outfile:
-        for line in infile:
-            if line.startswith("#") or not line.strip():
-                outfile.write(line)
+def scan_transcripts(path):
+    """
+    Phase one: list the mRNAs of each gene in file order, as (byte offsets, IDs),
+    and find where a trailing ##FASTA section starts (or the file size).
+    """
+    gene_to_rnas = {}
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b"##FASTA"):
+                return gene_to_rnas, offset
+            line_offset = offset
+            offset += len(line)
+            if b"\tmRNA\t" not in line:
                 continue
-
-            fields = line.strip().split("\t")
-            if len(fields) != 9:
-                outfile.write(line)
+            fields = line.split(b"\t")
+            if len(fields) != 9 or fields[2] != b"mRNA":
                 continue
+            rna_id = MRNA_ID.search(fields[8])
+            gene_id = MRNA_PARENT.search(fields[8])
+            if rna_id and gene_id:
+                offsets, ids = gene_to_rnas.setdefault(gene_id.group(1).decode(), ([], []))
+                offsets.append(line_offset)
+                ids.append(rna_id.group(1).decode())
+    return gene_to_rnas, offset
+
+def transcript_of(rnas, line_offset):
+    """
+    The mRNA read last before a gene-parented feature, as a single pass over the
+    file would have it; features above all mRNAs of their gene get the first one.
+    """
+    offsets, ids = rnas
+    return ids[max(bisect_right(offsets, line_offset) - 1, 0)]
+
+def fix_line(line, line_offset, gene_to_rnas):
+    if line.startswith("#") or not line.strip():
+        return line
+
+    fields = line.strip().split("\t")
+    if len(fields) != 9:
+        return line
+
+    attr_field = fields[8]
+    attrs = dict(x.split("=", 1) for x in attr_field.split(";") if "=" in x)
 
-            attr_field = fields[8]
-            attrs = dict(x.split("=", 1) for x in attr_field.split(";") if "=" in x)
+    if fields[2] == "mRNA":
+        if "Name" not in attrs and "gene" in attrs:
+            attrs["Name"] = attrs["gene"]
 
-            if fields[2] == "mRNA":
-                rna_id = attrs.get("ID")
-                gene_id = attrs.get("Parent")
-                gene_to_rna[gene_id] = rna_id
+    elif fields[2] in REMAPPED_TYPES:
+        parent = attrs.get("Parent")
+        if parent in gene_to_rnas:
+            attrs["Parent"] = transcript_of(gene_to_rnas[parent], line_offset)
+
+    fields[8] = ";".join(f"{k}={v}" for k, v in attrs.items())
+    return "\t".join(fields) + "\n"
+
+def chunk_bounds(path, end, n_chunks):
+    """Split the first ``end`` bytes of a file into ranges that start at line starts."""
+    bounds = [0]
+    with open(path, "rb") as f:
+        for k in range(1, n_chunks):
+            f.seek(max(end * k // n_chunks, bounds[-1]))
+            f.readline()
+            bounds.append(min(f.tell(), end))
+    bounds.append(end)
+    return [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+_gene_to_rnas = None
+
+def init_worker(gene_to_rnas):
+    global _gene_to_rnas
+    _gene_to_rnas = gene_to_rnas
+
+def rewrite_chunk(task):
+    """Phase two: rewrite the lines of one byte range into a part file."""
+    input_gff, lo, hi, part = task
+    with open(input_gff, "rb") as infile, open(part, "w") as outfile:
+        infile.seek(lo)
+        offset = lo
+        for raw in infile:
+            if offset >= hi:
+                break
+            outfile.write(fix_line(raw.decode(), offset, _gene_to_rnas))
+            offset += len(raw)
+    return part
+
+def main():
+    parser = argparse.ArgumentParser(description="Fix GFF for SnpEff.")
+    parser.add_argument("--input", dest="input_gff", type=Path, required=True, help="Input GFF file")
+    parser.add_argument("--output", dest="output_gff", type=Path, required=True, help="Output GFF file")
+    parser.add_argument("--threads", type=int, default=1, help="Processes rewriting chunks of the GFF in parallel")
+    args = parser.parse_args()
 
-                if "Name" not in attrs and "gene" in attrs:
-                    attrs["Name"] = attrs["gene"]
+    gene_to_rnas, features_end = scan_transcripts(args.input_gff)
+    print(f"Mapped {len(gene_to_rnas)} genes to their mRNAs")
 
-            elif fields[2] in {"CDS", "exon", "five_prime_UTR", "three_prime_UTR"}:
-                parent = attrs.get("Parent")
-                if parent in gene_to_rna:
-                    attrs["Parent"] = gene_to_rna[parent]
+    chunks = chunk_bounds(args.input_gff, features_end, max(args.threads, 1))
+    tasks = [(args.input_gff, lo, hi, f"{args.output_gff}.part{k}") for k, (lo, hi) in enumerate(chunks)]
+    if args.threads > 1 and len(tasks) > 1:
+        with Pool(min(args.threads, len(tasks)), initializer=init_worker, initargs=(gene_to_rnas,)) as pool:
+            parts = pool.map(rewrite_chunk, tasks)
+    else:
+        init_worker(gene_to_rnas)
+        parts = [rewrite_chunk(task) for task in tasks]
 
-            fields[8] = ";".join(f"{k}={v}" for k, v in attrs.items())
-            outfile.write("\t".join(fields) + "\n")
+    # Concatenate the parts in order, then copy any ##FASTA section unchanged
+    with args.output_gff.open("wb") as outfile:
+        for part in parts:
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, outfile)
+            os.remove(part)
+        with args.input_gff.open("rb") as infile:
+            infile.seek(features_end)
+            shutil.copyfileobj(infile, outfile)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,163 @@
+import argparse
+import bisect
+import csv
+import gzip
+import re
+from collections import defaultdict
+
+# ⬇️ Parse CLI args passed by Snakemake shell
+parser = argparse.ArgumentParser()
+parser.add_argument('--input', required=True, nargs='+', help="SnpEff-annotated VCF file(s) (plain or gzipped), e.g. one per shard")
+parser.add_argument('--output', required=True, help="Output TSV file")
+parser.add_argument('--counts', help="Optional TSV of annotation counts per gene, impact and effect")
+parser.add_argument('--genes', nargs='+', help="Genes to keep, as LOCUS or LOCUS=NAME (default: HAO1 and FLT1)")
+parser.add_argument('--gene_file', help="TSV of genes to keep: locus tag and optional gene name")
+parser.add_argument('--bed', help="BED file of regions to keep (0-based, half-open)")
+parser.add_argument('--candidates', help="SLRfinder candidates.csv: keep the variants of its 'region' column (chr:start-end)")
+parser.add_argument('--chrom_map', help="Two-column file renaming BED/candidate chromosomes to the VCF names (bcftools --rename-chrs format)")
+args = parser.parse_args()
+
+vcf_files = args.input
+out_file = args.output
+
+LOCUS_TO_GENE = {
+    "BLAG_LOCUS17194": "HAO1",
+    "BLAG_LOCUS17195": "FLT1"
+}
+
+FIELDNAMES = ["CHROM", "POS", "REF", "ALT", "GENE", "IMPACT", "EFFECT",
+              "EXON_RANK", "PROTEIN_CHANGE", "CDNA_CHANGE", "PROTEIN_POS"]
+ANN_RE = re.compile(r'(?:^|;)ANN=([^;]*)')
+
+# ⬇️ Gene set: command line, file, or the default loci (no gene filter with only a BED)
+genes = {}
+for entry in args.genes or []:
+    locus, _, name = entry.partition('=')
+    genes[locus] = name or locus
+if args.gene_file:
+    with open(args.gene_file) as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if parts[0] and not parts[0].startswith('#'):
+                genes[parts[0]] = parts[1] if len(parts) > 1 and parts[1] else parts[0]
+if not genes and not args.bed and not args.candidates:
+    genes = dict(LOCUS_TO_GENE)
+
+# ⬇️ Regions: sorted starts/ends per chromosome
+chrom_map = {}
+if args.chrom_map:
+    with open(args.chrom_map) as f:
+        chrom_map = dict(line.split()[:2] for line in f if line.strip())
+
+regions = None
+intervals = defaultdict(list)
+if args.bed:
+    with open(args.bed) as f:
+        for line in f:
+            if line.startswith(('#', 'track', 'browser')) or not line.strip():
+                continue
+            chrom, start, end = line.split('\t')[:3]
+            intervals[chrom_map.get(chrom, chrom)].append((int(start), int(end)))
+if args.candidates:
+    with open(args.candidates, newline='') as f:
+        for row in csv.DictReader(f):
+            chrom, _, span = row['region'].rpartition(':')
+            start, end = span.split('-')
+            intervals[chrom_map.get(chrom, chrom)].append((int(start) - 1, int(end)))
+if args.bed or args.candidates:
+    regions = {}
+    for chrom, spans in intervals.items():
+        spans.sort()
+        # Merge overlapping spans so a single bisect answers each lookup
+        merged = [list(spans[0])]
+        for start, end in spans[1:]:
+            if start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        regions[chrom] = ([s for s, _ in merged], [e for _, e in merged])
+
+
+def in_regions(chrom, pos):
+    """Whether a 1-based position falls in one of the BED regions."""
+    if chrom not in regions:
+        return False
+    starts, ends = regions[chrom]
+    k = bisect.bisect_right(starts, pos - 1) - 1
+    return k >= 0 and pos - 1 < ends[k]
+
+
+# Cheap test on the raw line before it is split
+prefilter = re.compile('|'.join(re.escape(g) for g in sorted(genes, key=len, reverse=True))).search if genes else None
+
+# To hold filtered variants
+summary_data = []
+
+def parse_vcf(vcf_file):
+    """Yield the summary rows of the target annotations of one VCF."""
+    opener = gzip.open if vcf_file.endswith('.gz') else open
+    with opener(vcf_file, 'rt') as vcf_in:
+        for line in vcf_in:
+            if line.startswith('#'):
+                continue
+            if prefilter is not None and not prefilter(line):
+                continue
+
+            # Only the fixed columns are split; sample columns stay in the remainder
+            fields = line.split('\t', 8)
+            chrom, pos = fields[0], int(fields[1])
+            if regions is not None and not in_regions(chrom, pos):
+                continue
+            ann_match = ANN_RE.search(fields[7].rstrip('\n'))
+            if not ann_match:
+                continue
+
+            for ann in ann_match.group(1).split(','):
+                if prefilter is not None and not prefilter(ann):
+                    continue
+                ann_fields = ann.split('|')
+                gene_id = ann_fields[3]  # This is like BLAG_LOCUS1234
+
+                # ⬇️ Check if this gene is one of interest
+                if genes and gene_id not in genes:
+                    continue
+
+                yield {
+                    "CHROM": chrom,
+                    "POS": pos,
+                    "REF": fields[3],
+                    "ALT": fields[4],
+                    "GENE": genes.get(gene_id, gene_id),
+                    "IMPACT": ann_fields[2],
+                    "EFFECT": ann_fields[1],
+                    "EXON_RANK": ann_fields[8],
+                    "PROTEIN_CHANGE": ann_fields[10],
+                    "CDNA_CHANGE": ann_fields[9],
+                    "PROTEIN_POS": ann_fields[13]
+                }
+
+
+# Shards are given in genomic order, so their rows are concatenated as they come
+for vcf_file in vcf_files:
+    summary_data.extend(parse_vcf(vcf_file))
+
+# ⬇️ Always write the header so downstream rules get their output
+with open(out_file, 'w', newline='') as f:
+    writer = csv.DictWriter(f, fieldnames=FIELDNAMES, delimiter='\t')
+    writer.writeheader()
+    writer.writerows(summary_data)
+
+if args.counts:
+    counts = defaultdict(int)
+    for row in summary_data:
+        counts[(row["GENE"], row["IMPACT"], row["EFFECT"])] += 1
+    with open(args.counts, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter='\t')
+        writer.writerow(["GENE", "IMPACT", "EFFECT", "COUNT"])
+        for key in sorted(counts):
+            writer.writerow([*key, counts[key]])
+
+if not summary_data:
+    print("No annotations found for target genes.")
+else:
+    print(f"Wrote {len(summary_data)} annotations")